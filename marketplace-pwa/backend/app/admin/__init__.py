@@ -1,20 +1,6 @@
-from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from ..shared.config import Config
-from .admin_routes import admin_bp
-
-db = SQLAlchemy()
-migrate = Migrate()
+from ..factory import create_app as create_backend_app
 
 def create_app(config_class=Config):
-    app = Flask(__name__)
-    app.config.from_object(config_class)
-
-    db.init_app(app)
-    migrate.init_app(app, db)
-
-    # Register only the admin blueprint
-    app.register_blueprint(admin_bp)
-
-    return app
+    # Admin blueprint only
+    return create_backend_app('admin', config_class)
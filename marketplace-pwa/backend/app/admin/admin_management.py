@@ -1,34 +1,99 @@
-from ..shared.models import User, db
+from ..shared.models import User, Product, StoreSalesRollup, ProductSalesRollup, db
+from ..shared.analytics import PERIODS, period_start
+from ..shared.events import emit_event
+from ..shared.database import get_pool_stats, replica_reads
+from ..shared.utils import (
+    approximate_count, clean_email, clean_username, decode_cursor, iter_keyset, keyset_columns, keyset_page, parse_page_size,
+    parse_sort, INVALID_EMAIL_MESSAGE, INVALID_USERNAME_MESSAGE
+)
+from ..shared.auth import invalidate_user_cache, user_cache, token_cache
+import datetime
 import logging
-import bleach
+from sqlalchemy import or_
 
-def get_users_logic():
-    users = User.query.all()
-    users_data = [{'id': user.id, 'username': user.username, 'email': user.email, 'is_admin': user.is_admin} for user in users]
+def user_to_dict(user):
+    return {'id': user.id, 'username': user.username, 'email': user.email, 'is_admin': user.is_admin}
+
+USER_SORTS = {'id': User.id, 'username': User.username}
+
+def filter_users_query(args):
+    """
+    Build the users query (only the listed columns, no ORM objects) with the filters in the request args.
+    Returns (query, filtered, None) or (None, None, error message)
+    """
+    query = db.session.query(User.id, User.username, User.email, User.is_admin)
+    filtered = False
+    if args.get('q'):
+        # Prefix match on username or email, both have a unique index
+        query = query.filter(or_(User.username.startswith(args['q'], autoescape=True),
+                                 User.email.startswith(args['q'], autoescape=True)))
+        filtered = True
+    if args.get('is_admin'):
+        is_admin = args['is_admin'].lower()
+        if is_admin not in ('true', 'false'):
+            return None, None, 'is_admin must be true or false'
+        query = query.filter(User.is_admin == (is_admin == 'true'))
+        filtered = True
+    return query, filtered, None
+
+@replica_reads
+def get_users_logic(args):
+    """
+    One page of users. ?limit=&cursor=&sort=id|username&q=<username/email prefix>&is_admin=true|false
+    The approximate total (see approximate_count) is only computed for the first page
+    """
+    limit = parse_page_size(args.get('limit'))
+    if limit is None:
+        return {'message': 'limit must be a positive integer'}, 400
+    sort = parse_sort(args.get('sort'), USER_SORTS)
+    if sort is None:
+        return {'message': f"sort must be one of: {', '.join(USER_SORTS)} (prefix with - for descending)"}, 400
+    sort_column, descending = sort
+    cursor_values = None
+    if args.get('cursor'):
+        cursor_values = decode_cursor(args['cursor'], keyset_columns(sort_column, User.id))
+        if cursor_values is None:
+            return {'message': 'Invalid cursor'}, 400
+    query, filtered, error = filter_users_query(args)
+    if error:
+        return {'message': error}, 400
+    users, next_cursor = keyset_page(query, sort_column, User.id, cursor_values, limit, descending)
+    users_data = {'items': [user_to_dict(user) for user in users], 'next_cursor': next_cursor}
+    if cursor_values is None:
+        users_data['total'], users_data['total_is_exact'] = approximate_count(query, User.__tablename__, filtered)
     return users_data, 200
 
+def stream_users_logic(args):
+    query, _, error = filter_users_query(args)
+    if error:
+        return {'message': error}, 400
+    users = iter_keyset(query, User.id)
+    return (user_to_dict(user) for user in users), 200
+
+@replica_reads
 def get_user_logic(user_id):
     user = User.query.get_or_404(user_id)
-    user_data = {
-        'id': user.id,
-        'username': user.username,
-        'email': user.email,
-        'is_admin': user.is_admin
-    }
+    user_data = user_to_dict(user)
     return user_data, 200
 
 def update_user_logic(user_id, data):
     user = User.query.get_or_404(user_id)
     if not data:
         return {'message': 'No data provided'}, 400
+    username = clean_username(data['username']) if 'username' in data else user.username
+    if username is None:
+        return {'message': INVALID_USERNAME_MESSAGE}, 400
+    email = clean_email(data['email']) if 'email' in data else user.email
+    if email is None:
+        return {'message': INVALID_EMAIL_MESSAGE}, 400
     try:
-        if 'username' in data:
-            user.username = bleach.clean(data['username'], strip=True)
-        if 'email' in data:
-            user.email = bleach.clean(data['email'], strip=True)
+        user.username = username
+        user.email = email
         if 'is_admin' in data:
             user.is_admin = data['is_admin']
+        emit_event('user.updated', 'user', user.id, user_to_dict(user))
         db.session.commit()
+        invalidate_user_cache(user_id)
         return {'message': 'User updated successfully'}, 200
     except Exception as e:
         db.session.rollback()
@@ -39,9 +104,98 @@ def delete_user_logic(user_id):
     user = User.query.get_or_404(user_id)
     try:
         db.session.delete(user)
+        emit_event('user.deleted', 'user', user.id)
         db.session.commit()
+        invalidate_user_cache(user_id)
         return {'message': 'User deleted successfully'}, 200
     except Exception as e:
         db.session.rollback()
         logging.error(f"Error deleting user: {e}")
         return {'message': 'Failed to delete user'}, 500
+
+def get_auth_cache_stats_logic():
+    return {'users': user_cache.stats(), 'tokens': token_cache.stats()}, 200
+
+def get_db_pool_stats_logic():
+    return get_pool_stats(), 200
+
+def parse_analytics_period(args):
+    """
+    Returns (period, error message) from the 'period' query parameter (day by default)
+    """
+    period = args.get('period', 'day')
+    if period not in PERIODS:
+        return None, f"period must be one of: {', '.join(PERIODS)}"
+    return period, None
+
+def parse_date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+@replica_reads
+def get_sales_logic(args):
+    """
+    Revenue, units and orders per store and period from the rollups. ?period=day|week&from=&to=&store_id=
+    Defaults to the last 30 days/12 weeks. orders counts the orders containing products of the store
+    """
+    period, error = parse_analytics_period(args)
+    if error:
+        return {'message': error}, 400
+    today = datetime.datetime.utcnow().date()
+    end = parse_date(args['to']) if args.get('to') else today
+    start = parse_date(args['from']) if args.get('from') else today - datetime.timedelta(days=29 if period == 'day' else 7 * 11)
+    if start is None or end is None:
+        return {'message': 'from and to must be dates (YYYY-MM-DD)'}, 400
+    query = StoreSalesRollup.query.filter(StoreSalesRollup.period == period,
+                                          StoreSalesRollup.period_start.between(period_start(period, start), end))
+    if args.get('store_id'):
+        store_id = args.get('store_id', type=int)
+        if store_id is None:
+            return {'message': 'store_id must be an integer'}, 400
+        query = query.filter(StoreSalesRollup.store_id == store_id)
+    rows = query.order_by(StoreSalesRollup.period_start, StoreSalesRollup.store_id).all()
+    sales_data = [{
+        'period_start': row.period_start.isoformat(),
+        'store_id': row.store_id,
+        'orders': row.orders,
+        'units': row.units,
+        'revenue': round(row.revenue, 2)
+    } for row in rows]
+    return {'period': period, 'items': sales_data}, 200
+
+@replica_reads
+def get_top_products_logic(args):
+    """
+    Best selling products by revenue of one period. ?period=day|week&date=&store_id=&limit=
+    date is any day inside the period (today by default)
+    """
+    period, error = parse_analytics_period(args)
+    if error:
+        return {'message': error}, 400
+    day = parse_date(args['date']) if args.get('date') else datetime.datetime.utcnow().date()
+    if day is None:
+        return {'message': 'date must be a date (YYYY-MM-DD)'}, 400
+    limit = min(args.get('limit', 10, type=int), 100)
+    if limit <= 0:
+        return {'message': 'limit must be a positive integer'}, 400
+    start = period_start(period, day)
+    query = (db.session.query(ProductSalesRollup.product_id, ProductSalesRollup.store_id, ProductSalesRollup.units,
+                              ProductSalesRollup.revenue, Product.name)
+             .join(Product, Product.id == ProductSalesRollup.product_id)
+             .filter(ProductSalesRollup.period == period, ProductSalesRollup.period_start == start))
+    if args.get('store_id'):
+        store_id = args.get('store_id', type=int)
+        if store_id is None:
+            return {'message': 'store_id must be an integer'}, 400
+        query = query.filter(ProductSalesRollup.store_id == store_id)
+    rows = query.order_by(ProductSalesRollup.revenue.desc()).limit(limit).all()
+    products_data = [{
+        'product_id': row.product_id,
+        'name': row.name,
+        'store_id': row.store_id,
+        'units': row.units,
+        'revenue': round(row.revenue, 2)
+    } for row in rows]
+    return {'period': period, 'period_start': start.isoformat(), 'items': products_data}, 200
@@ -1,6 +1,10 @@
 from flask import Blueprint, jsonify, request
 from ..shared.auth import token_required, admin_required
-from .admin_management import get_users_logic, get_user_logic, update_user_logic, delete_user_logic
+from ..shared.utils import wants_ndjson, ndjson_response
+from .admin_management import (
+    get_users_logic, get_user_logic, update_user_logic, delete_user_logic, stream_users_logic,
+    get_auth_cache_stats_logic, get_db_pool_stats_logic, get_sales_logic, get_top_products_logic
+)
 
 admin_bp = Blueprint('admin_bp', __name__, url_prefix='/admin/api')
 
@@ -8,7 +12,10 @@ admin_bp = Blueprint('admin_bp', __name__, url_prefix='/admin/api')
 @token_required
 @admin_required
 def get_users(current_user):
-    result, status = get_users_logic()
+    # With 'Accept: application/x-ndjson' users are streamed one per line instead of one big array
+    if wants_ndjson():
+        return ndjson_response(*stream_users_logic(request.args))
+    result, status = get_users_logic(request.args)
     return jsonify(result), status
 
 @admin_bp.route('/users/<int:user_id>', methods=['GET'])
@@ -32,3 +39,36 @@ def update_user(current_user, user_id):
 def delete_user(current_user, user_id):
     result, status = delete_user_logic(user_id)
     return jsonify(result), status
+
+# Hit/miss counters of this process' authenticated-user and verified-token caches (see shared/auth.py).
+# /metrics has the same counters for all the workers (cache_*)
+@admin_bp.route('/stats/auth-cache', methods=['GET'])
+@token_required
+@admin_required
+def get_auth_cache_stats(current_user):
+    result, status = get_auth_cache_stats_logic()
+    return jsonify(result), status
+
+# Connection pool usage of this process (checked-out, overflow, wait time), to size DB_POOL_SIZE/DB_MAX_OVERFLOW.
+# /metrics has the same numbers for all the workers (db_pool_*)
+@admin_bp.route('/stats/db-pool', methods=['GET'])
+@token_required
+@admin_required
+def get_db_pool_stats(current_user):
+    result, status = get_db_pool_stats_logic()
+    return jsonify(result), status
+
+# Sales analytics served from the rollup tables (see shared/analytics.py)
+@admin_bp.route('/analytics/sales', methods=['GET'])
+@token_required
+@admin_required
+def get_sales(current_user):
+    result, status = get_sales_logic(request.args)
+    return jsonify(result), status
+
+@admin_bp.route('/analytics/top-products', methods=['GET'])
+@token_required
+@admin_required
+def get_top_products(current_user):
+    result, status = get_top_products_logic(request.args)
+    return jsonify(result), status
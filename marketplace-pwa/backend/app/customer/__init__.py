@@ -1,21 +1,6 @@
-from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from ..shared.config import Config
-
-from .customer_routes import customer_bp
-
-db = SQLAlchemy()
-migrate = Migrate()
+from ..factory import create_app as create_backend_app
 
 def create_app(config_class=Config):
-    app = Flask(__name__)
-    app.config.from_object(config_class)
-
-    db.init_app(app)
-    migrate.init_app(app, db)
-
-    # Register only the customer blueprint
-    app.register_blueprint(customer_bp)
-
-    return app
+    # Customer blueprint only
+    return create_backend_app('customer', config_class)
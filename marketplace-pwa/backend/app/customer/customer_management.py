@@ -1,7 +1,46 @@
-from ..shared.models import User, Store, Product, Order, OrderItem, db
+from ..shared.models import User, Store, Product, Order, OrderItem, OrderRequest, db
 import logging
-from ..shared.auth import generate_token, decode_token
-import bleach
+from ..shared.auth import generate_token, decode_token, PRINCIPAL_ENVIRON_KEY
+from ..shared.response_cache import invalidate_responses
+from ..shared.passwords import PasswordHasherBusy
+from ..shared.analytics import record_order_sales
+from ..shared.events import emit_event
+from ..shared.database import replica_reads
+from ..shared.utils import (
+    decode_cursor, keyset_columns, parse_ids, parse_page_size, parse_sort, keyset_page, iter_records, clean_text, dispatch_subrequest,
+    clean_username, clean_email, iter_keyset, MAX_PAGE_SIZE, INVALID_USERNAME_MESSAGE, INVALID_EMAIL_MESSAGE
+)
+import csv
+import datetime
+import hashlib
+import json
+import re
+from urllib.parse import urlsplit
+from flask import current_app
+from sqlalchemy import and_, case, func, or_, select, update
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload, undefer
+
+# Sort options allowed on the paginated catalog listings. Every option is paired with the primary key
+# to make the keyset unique
+STORE_SORTS = {'id': Store.id, 'name': Store.name}
+PRODUCT_SORTS = {'id': Product.id, 'name': Product.name, 'price': Product.price}
+# Bulk product import: rows are saved (and committed) in chunks of this size
+IMPORT_BATCH_SIZE = 1000
+# Max row errors listed in an import report, the rest are only counted
+IMPORT_MAX_REPORTED_ERRORS = 1000
+# Limits of the products columns (MySQL INT and String lengths): a row outside them would fail its whole chunk
+IMPORT_NAME_MAX_LENGTH = Product.__table__.c.name.type.length
+IMPORT_SKU_MAX_LENGTH = Product.__table__.c.sku.type.length
+IMPORT_INT_RANGE = (-2 ** 31, 2 ** 31 - 1)
+# Words of a search query. Anything else (eg: MySQL boolean mode operators) is dropped
+SEARCH_TERM_RE = re.compile(r'\w+', re.UNICODE)
+# Max sub-requests of one POST /api/batch
+BATCH_MAX_REQUESTS = 20
+# Same limit as the idempotency_key column
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
 
 def register_user_logic(data):
     if not data:
@@ -9,9 +48,13 @@ def register_user_logic(data):
     required_fields = ['username', 'password', 'email']
     if not all(field in data for field in required_fields):
         return {'message': 'Missing required fields'}, 400
-    # Sanitize username and email
-    username = bleach.clean(data['username'], strip=True)
-    email = bleach.clean(data['email'], strip=True)
+    # Usernames and emails are validated against their charset instead of being stripped of HTML
+    username = clean_username(data['username'])
+    if username is None:
+        return {'message': INVALID_USERNAME_MESSAGE}, 400
+    email = clean_email(data['email'])
+    if email is None:
+        return {'message': INVALID_EMAIL_MESSAGE}, 400
     if User.query.filter_by(username=username).first():
         return {'message': 'Username already exists'}, 400
     if User.query.filter_by(email=email).first():
@@ -20,9 +63,14 @@ def register_user_logic(data):
         new_user = User(username=username, email=email) # type: ignore
         new_user.set_password(data['password'])
         db.session.add(new_user)
+        db.session.flush()
+        emit_event('user.registered', 'user', new_user.id, {'username': username, 'email': email})
         db.session.commit()
         token = generate_token(new_user)
         return {'message': 'User created successfully', 'token': token}, 201
+    except PasswordHasherBusy:
+        db.session.rollback()
+        return {'message': 'Server busy, please try again'}, 503
     except Exception as e:
         db.session.rollback()
         logging.error(f"Error creating user: {e}")
@@ -35,8 +83,20 @@ def login_user_logic(data):
     if not all(field in data for field in required_fields):
         return {'message': 'Missing required fields'}, 400
     user = User.query.filter_by(username=data['username']).first()
-    if not user or not user.check_password(data['password']):
-        return {'message': 'Invalid credentials'}, 401
+    try:
+        if not user or not user.check_password(data['password']):
+            return {'message': 'Invalid credentials'}, 401
+    except PasswordHasherBusy:
+        return {'message': 'Server busy, please try again'}, 503
+    # Transparently upgrade the stored hash when the hashing method/cost has changed
+    if user.password_needs_rehash():
+        try:
+            user.set_password(data['password'])
+            db.session.commit()
+        except Exception as e:
+            # A failed rehash must not block the login, the old hash is still valid
+            db.session.rollback()
+            logging.error(f"Error rehashing password: {e}")
     token = generate_token(user)
     return {'message': 'Login successful', 'token': token}, 200
 
@@ -59,11 +119,68 @@ def decode_user_logic(data):
     else:
         return {'message': 'Invalid or expired token'}, 401
 
-def get_stores_logic():
-    stores = Store.query.all()
-    stores_data = [{'id': store.id, 'name': store.name, 'description': store.description, 'owner_id': store.owner_id} for store in stores]
-    return stores_data, 200
+def filter_stores_query(args):
+    """
+    Build the stores query with the filters in the request args. Returns (query, None) or (None, error message)
+    """
+    query = Store.query
+    if args.get('owner_id'):
+        owner_id = args.get('owner_id', type=int)
+        if owner_id is None:
+            return None, 'owner_id must be an integer'
+        query = query.filter(Store.owner_id == owner_id)
+    if args.get('name'):
+        # Prefix match (LIKE 'abc%') can use an index on name, unlike a contains match
+        query = query.filter(Store.name.startswith(args['name'], autoescape=True))
+    return query, None
+
+def store_to_dict(store):
+    return {'id': store.id, 'name': store.name, 'description': store.description, 'owner_id': store.owner_id}
+
+@replica_reads
+def get_stores_logic(args):
+    limit = parse_page_size(args.get('limit'))
+    if limit is None:
+        return {'message': 'limit must be a positive integer'}, 400
+    sort = parse_sort(args.get('sort'), STORE_SORTS)
+    if sort is None:
+        return {'message': f"sort must be one of: {', '.join(STORE_SORTS)} (prefix with - for descending)"}, 400
+    sort_column, descending = sort
+    cursor_values = None
+    if args.get('cursor'):
+        cursor_values = decode_cursor(args['cursor'], keyset_columns(sort_column, Store.id))
+        if cursor_values is None:
+            return {'message': 'Invalid cursor'}, 400
+    query, error = filter_stores_query(args)
+    if error:
+        return {'message': error}, 400
+    stores, next_cursor = keyset_page(query, sort_column, Store.id, cursor_values, limit, descending)
+    stores_data = [store_to_dict(store) for store in stores]
+    return {'items': stores_data, 'next_cursor': next_cursor}, 200
+
+def stream_stores_logic(args):
+    """
+    Same filters as get_stores_logic but unpaginated, rows are fetched in batches while the response is sent
+    """
+    query, error = filter_stores_query(args)
+    if error:
+        return {'message': error}, 400
+    stores = iter_keyset(query, Store.id)
+    return (store_to_dict(store) for store in stores), 200
+
+@replica_reads
+def get_stores_by_ids_logic(args):
+    """
+    Multi-get: ?ids=1,2,3 in one IN query. Items follow the order of ids, ids not found are listed in 'missing'
+    """
+    ids = parse_ids(args.get('ids'))
+    if ids is None:
+        return {'message': f'ids must be a comma separated list of up to {MAX_PAGE_SIZE} integers'}, 400
+    stores = {store.id: store for store in Store.query.filter(Store.id.in_(ids))}
+    stores_data = [store_to_dict(stores[store_id]) for store_id in ids if store_id in stores]
+    return {'items': stores_data, 'missing': [store_id for store_id in ids if store_id not in stores]}, 200
 
+@replica_reads
 def get_store_logic(store_id):
     store = Store.query.get_or_404(store_id)
     store_data = {
@@ -80,11 +197,14 @@ def create_store_logic(current_user, data):
         return {'message': 'Missing required fields'}, 400
     try:
         # Sanitize store name and description
-        name = bleach.clean(data['name'], strip=True)
-        description = bleach.clean(data['description'], strip=True)
+        name = clean_text(data['name'])
+        description = clean_text(data['description'])
         new_store = Store(name=name, description=description, owner_id=current_user.id)
         db.session.add(new_store)
+        db.session.flush()
+        emit_event('store.created', 'store', new_store.id, {'name': name, 'owner_id': current_user.id})
         db.session.commit()
+        invalidate_responses('stores')
         return {'message': 'Store created successfully', 'store_id': new_store.id}, 201
     except Exception as e:
         db.session.rollback()
@@ -97,10 +217,12 @@ def update_store_logic(current_user, store_id, data):
         return {'message': 'Unauthorized'}, 403
     try:
         if 'name' in data:
-            store.name = bleach.clean(data['name'], strip=True)
+            store.name = clean_text(data['name'])
         if 'description' in data:
-            store.description = bleach.clean(data['description'], strip=True)
+            store.description = clean_text(data['description'])
+        emit_event('store.updated', 'store', store.id, {'name': store.name, 'description': store.description})
         db.session.commit()
+        invalidate_responses('stores')
         return {'message': 'Store updated successfully'}, 200
     except Exception as e:
         db.session.rollback()
@@ -113,27 +235,128 @@ def delete_store_logic(current_user, store_id):
         return {'message': 'Unauthorized'}, 403
     try:
         db.session.delete(store)
+        emit_event('store.deleted', 'store', store.id, {'owner_id': store.owner_id})
         db.session.commit()
+        invalidate_responses('stores', 'products')
         return {'message': 'Store deleted successfully'}, 200
     except Exception as e:
         db.session.rollback()
         logging.error(f"Error deleting store: {e}")
         return {'message': 'Failed to delete store'}, 500
 
-def get_products_logic():
-    products = Product.query.all()
-    products_data = [{'id': product.id, 'name': product.name, 'description': product.description, 'price': product.price, 'store_id': product.store_id} for product in products]
-    return products_data, 200
+def filter_products_query(args):
+    """
+    Build the products query with the filters in the request args. Returns (query, None) or (None, error message)
+    """
+    query = Product.query
+    if args.get('store_id'):
+        store_id = args.get('store_id', type=int)
+        if store_id is None:
+            return None, 'store_id must be an integer'
+        query = query.filter(Product.store_id == store_id)
+    if args.get('min_price'):
+        min_price = args.get('min_price', type=float)
+        if min_price is None:
+            return None, 'min_price must be a number'
+        query = query.filter(Product.price >= min_price)
+    if args.get('max_price'):
+        max_price = args.get('max_price', type=float)
+        if max_price is None:
+            return None, 'max_price must be a number'
+        query = query.filter(Product.price <= max_price)
+    if args.get('name'):
+        query = query.filter(Product.name.startswith(args['name'], autoescape=True))
+    return query, None
 
+def product_to_dict(product):
+    return {'id': product.id, 'name': product.name, 'description': product.description, 'price': product.price, 'store_id': product.store_id, 'sku': product.sku, 'stock': product.stock}
+
+@replica_reads
+def get_products_logic(args):
+    limit = parse_page_size(args.get('limit'))
+    if limit is None:
+        return {'message': 'limit must be a positive integer'}, 400
+    sort = parse_sort(args.get('sort'), PRODUCT_SORTS)
+    if sort is None:
+        return {'message': f"sort must be one of: {', '.join(PRODUCT_SORTS)} (prefix with - for descending)"}, 400
+    sort_column, descending = sort
+    cursor_values = None
+    if args.get('cursor'):
+        cursor_values = decode_cursor(args['cursor'], keyset_columns(sort_column, Product.id))
+        if cursor_values is None:
+            return {'message': 'Invalid cursor'}, 400
+    query, error = filter_products_query(args)
+    if error:
+        return {'message': error}, 400
+    products, next_cursor = keyset_page(query, sort_column, Product.id, cursor_values, limit, descending)
+    products_data = [product_to_dict(product) for product in products]
+    return {'items': products_data, 'next_cursor': next_cursor}, 200
+
+def stream_products_logic(args):
+    """
+    Same filters as get_products_logic but unpaginated, rows are fetched in batches while the response is sent
+    """
+    query, error = filter_products_query(args)
+    if error:
+        return {'message': error}, 400
+    products = iter_keyset(query, Product.id)
+    return (product_to_dict(product) for product in products), 200
+
+def product_relevance(terms):
+    """
+    Relevance of a product for the search terms, and the condition a product must match
+    MySQL: FULLTEXT index on (name, description), every term required and matched as a prefix ('+lapt*')
+    Other databases (eg: SQLite in local runs): LIKE fallback, a full scan only meant for small data sets
+    """
+    if db.engine.dialect.name == 'mysql':
+        relevance = match(Product.name, Product.description, against=' '.join(f'+{term}*' for term in terms)).in_boolean_mode()
+        return relevance.label('relevance'), relevance
+    relevance = sum(case((Product.name.contains(term, autoescape=True), 2), else_=1) for term in terms)
+    condition = and_(*[or_(Product.name.contains(term, autoescape=True), Product.description.contains(term, autoescape=True)) for term in terms])
+    return relevance.label('relevance'), condition
+
+@replica_reads
+def search_products_logic(args):
+    terms = SEARCH_TERM_RE.findall(args.get('q', ''))
+    if not terms:
+        return {'message': 'q must contain at least one word'}, 400
+    limit = parse_page_size(args.get('limit'))
+    if limit is None:
+        return {'message': 'limit must be a positive integer'}, 400
+    relevance, condition = product_relevance(terms)
+    cursor_values = None
+    if args.get('cursor'):
+        cursor_values = decode_cursor(args['cursor'], [relevance, Product.id])
+        if cursor_values is None:
+            return {'message': 'Invalid cursor'}, 400
+    # Same filters as the catalog listing (store_id, price range, name prefix) on top of the search
+    query, error = filter_products_query(args)
+    if error:
+        return {'message': error}, 400
+    query = query.filter(condition).with_entities(
+        Product.id, Product.name, Product.description, Product.price, Product.store_id, Product.sku, Product.stock, relevance)
+    # Most relevant first, keyset paginated on (relevance, id)
+    rows, next_cursor = keyset_page(query, relevance, Product.id, cursor_values, limit, descending=True)
+    products_data = [dict(product_to_dict(row), relevance=float(row.relevance)) for row in rows]
+    return {'items': products_data, 'next_cursor': next_cursor}, 200
+
+@replica_reads
+def get_products_by_ids_logic(args):
+    """
+    Multi-get: ?ids=1,2,3 in one IN query (eg: the products of a cart). Items follow the order of ids,
+    ids not found are listed in 'missing'
+    """
+    ids = parse_ids(args.get('ids'))
+    if ids is None:
+        return {'message': f'ids must be a comma separated list of up to {MAX_PAGE_SIZE} integers'}, 400
+    products = {product.id: product for product in Product.query.filter(Product.id.in_(ids))}
+    products_data = [product_to_dict(products[product_id]) for product_id in ids if product_id in products]
+    return {'items': products_data, 'missing': [product_id for product_id in ids if product_id not in products]}, 200
+
+@replica_reads
 def get_product_logic(product_id):
     product = Product.query.get_or_404(product_id)
-    product_data = {
-        'id': product.id,
-        'name': product.name,
-        'description': product.description,
-        'price': product.price,
-        'store_id': product.store_id
-    }
+    product_data = product_to_dict(product)
     return product_data, 200
 
 def create_product_logic(current_user, data):
@@ -145,17 +368,128 @@ def create_product_logic(current_user, data):
         if store.owner_id != current_user.id:
             return {'message': 'Unauthorized to add product to this store'}, 403
         # Sanitize product name and description
-        name = bleach.clean(data['name'], strip=True)
-        description = bleach.clean(data['description'], strip=True)
-        new_product = Product(name=name, description=description, price=data['price'], store_id=data['store_id'])
+        name = clean_text(data['name'])
+        description = clean_text(data['description'])
+        new_product = Product(name=name, description=description, price=data['price'], store_id=data['store_id'], sku=data.get('sku'), stock=data.get('stock'))
         db.session.add(new_product)
+        db.session.flush()
+        emit_event('product.created', 'product', new_product.id, product_to_dict(new_product))
         db.session.commit()
+        invalidate_responses('products')
         return {'message': 'Product created successfully', 'product_id': new_product.id}, 201
     except Exception as e:
         db.session.rollback()
         logging.error(f"Error creating product: {e}")
         return {'message': 'Failed to create product'}, 500
 
+def upsert_products_statement():
+    """
+    INSERT of products that updates the existing product with the same (store_id, sku) instead of failing
+    """
+    table = Product.__table__
+    if db.engine.dialect.name == 'mysql':
+        statement = mysql.insert(table)
+        # A row without stock keeps the current stock
+        return statement.on_duplicate_key_update(name=statement.inserted.name, description=statement.inserted.description,
+                                                 price=statement.inserted.price,
+                                                 stock=func.coalesce(statement.inserted.stock, table.c.stock))
+    if db.engine.dialect.name == 'sqlite':
+        statement = sqlite.insert(table)
+        return statement.on_conflict_do_update(index_elements=['store_id', 'sku'], set_={
+            'name': statement.excluded.name, 'description': statement.excluded.description, 'price': statement.excluded.price,
+            'stock': func.coalesce(statement.excluded.stock, table.c.stock)})
+    return table.insert()
+
+def import_products_logic(current_user, store_id, stream, content_type):
+    """
+    Create or update (matched by sku) the products of a store from a CSV or NDJSON body, read as a stream.
+    Every record has name, price and optionally description, sku and stock. Valid rows are saved in chunks of
+    IMPORT_BATCH_SIZE (one executemany + commit per chunk), invalid rows (including values too long or too large for
+    their column) are listed in the report
+    """
+    store = Store.query.get_or_404(store_id)
+    if store.owner_id != current_user.id:
+        return {'message': 'Unauthorized to add products to this store'}, 403
+    records = iter_records(stream, content_type)
+    if records is None:
+        return {'message': 'Content-Type must be text/csv or application/x-ndjson'}, 415
+    statement = upsert_products_statement()
+    report = {'imported': 0, 'failed': 0, 'errors': []}
+
+    def add_error(row, message):
+        report['failed'] += 1
+        if len(report['errors']) < IMPORT_MAX_REPORTED_ERRORS:
+            report['errors'].append({'row': row, 'message': message})
+
+    def save(batch):
+        try:
+            db.session.execute(statement, [values for _, values in batch])
+            # One event per batch, the upserted products are identified by their sku
+            emit_event('products.imported', 'store', store.id,
+                       {'count': len(batch), 'skus': [values['sku'] for _, values in batch if values['sku']]})
+            db.session.commit()
+            report['imported'] += len(batch)
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Error importing products: {e}")
+            for row, _ in batch:
+                add_error(row, 'Failed to save the batch of this row')
+
+    batch = []
+    try:
+        for row, record in records:
+            if record is None:
+                add_error(row, 'Invalid JSON object')
+                continue
+            if not record.get('name'):
+                add_error(row, 'Missing name')
+                continue
+            name = clean_text(str(record['name']))
+            if len(name) > IMPORT_NAME_MAX_LENGTH:
+                add_error(row, f'name must be at most {IMPORT_NAME_MAX_LENGTH} characters')
+                continue
+            sku = str(record['sku']) if record.get('sku') else None
+            if sku is not None and len(sku) > IMPORT_SKU_MAX_LENGTH:
+                add_error(row, f'sku must be at most {IMPORT_SKU_MAX_LENGTH} characters')
+                continue
+            try:
+                price = float(record.get('price'))
+            except (TypeError, ValueError):
+                add_error(row, 'price must be a number')
+                continue
+            if not IMPORT_INT_RANGE[0] <= price <= IMPORT_INT_RANGE[1]:
+                add_error(row, f'price must be between {IMPORT_INT_RANGE[0]} and {IMPORT_INT_RANGE[1]}')
+                continue
+            stock = None
+            if record.get('stock') not in (None, ''):
+                try:
+                    stock = int(record['stock'])
+                except (TypeError, ValueError):
+                    add_error(row, 'stock must be an integer')
+                    continue
+                if not IMPORT_INT_RANGE[0] <= stock <= IMPORT_INT_RANGE[1]:
+                    add_error(row, f'stock must be between {IMPORT_INT_RANGE[0]} and {IMPORT_INT_RANGE[1]}')
+                    continue
+            batch.append((row, {
+                'name': name,
+                'description': clean_text(str(record.get('description') or '')),
+                'price': price,
+                'store_id': store.id,
+                'sku': sku,
+                'stock': stock
+            }))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                save(batch)
+                batch = []
+        if batch:
+            save(batch)
+    except (UnicodeDecodeError, csv.Error) as e:
+        add_error(None, f'Unreadable body, import stopped: {e}')
+    if report['imported']:
+        invalidate_responses('products')
+    report['message'] = 'Products imported' if not report['failed'] else 'Products imported with errors'
+    return report, 200
+
 def update_product_logic(current_user, product_id, data):
     product = Product.query.get_or_404(product_id)
     store = Store.query.get(product.store_id)
@@ -163,14 +497,20 @@ def update_product_logic(current_user, product_id, data):
         return {'message': 'Unauthorized'}, 403
     try:
         if 'name' in data:
-            product.name = bleach.clean(data['name'], strip=True)
+            product.name = clean_text(data['name'])
         if 'description' in data:
-            product.description = bleach.clean(data['description'], strip=True)
+            product.description = clean_text(data['description'])
         if 'price' in data:
             product.price = data['price']
         if 'store_id' in data:
             product.store_id = data['store_id']
+        if 'sku' in data:
+            product.sku = data['sku']
+        if 'stock' in data:
+            product.stock = data['stock']
+        emit_event('product.updated', 'product', product.id, product_to_dict(product))
         db.session.commit()
+        invalidate_responses('products')
         return {'message': 'Product updated successfully'}, 200
     except Exception as e:
         db.session.rollback()
@@ -184,77 +524,298 @@ def delete_product_logic(current_user, product_id):
         return {'message': 'Unauthorized'}, 403
     try:
         db.session.delete(product)
+        emit_event('product.deleted', 'product', product.id, {'store_id': product.store_id})
         db.session.commit()
+        invalidate_responses('products')
         return {'message': 'Product deleted successfully'}, 200
     except Exception as e:
         db.session.rollback()
         logging.error(f"Error deleting product: {e}")
         return {'message': 'Failed to delete product'}, 500
 
-def get_orders_logic(current_user):
-    orders = Order.query.filter_by(user_id=current_user.id).all()
-    orders_data = [{
+def orders_query(include_products=False):
+    """
+    Orders query with their items eager loaded, so listing N orders costs a constant number of SELECTs
+    (orders + order_items [+ products joined in the same SELECT]) instead of one extra SELECT per order
+    """
+    items_loader = selectinload(Order.items)
+    if include_products:
+        items_loader = items_loader.options(undefer(OrderItem.unit_price), joinedload(OrderItem.product))
+    return Order.query.options(items_loader)
+
+def order_item_to_dict(item, include_products=False):
+    item_data = {'product_id': item.product_id, 'quantity': item.quantity}
+    if include_products:
+        item_data['product_name'] = item.product.name
+        item_data['price'] = item.unit_price
+    return item_data
+
+def order_to_dict(order, include_products=False):
+    return {
         'id': order.id,
         'user_id': order.user_id,
         'order_date': order.order_date,
         'total_amount': order.total_amount,
-        'items': [{'product_id': item.product_id, 'quantity': item.quantity} for item in order.items]
-    } for order in orders]
+        'items': [order_item_to_dict(item, include_products) for item in order.items]
+    }
+
+def includes_products(args):
+    return 'products' in args.get('include', '').split(',')
+
+@replica_reads
+def get_orders_logic(current_user, args):
+    include_products = includes_products(args)
+    orders = orders_query(include_products).filter_by(user_id=current_user.id).all()
+    orders_data = [order_to_dict(order, include_products) for order in orders]
     return orders_data, 200
 
-def get_order_logic(current_user, order_id):
-    order = Order.query.get_or_404(order_id)
+def stream_orders_logic(current_user, args):
+    include_products = includes_products(args)
+    orders = iter_keyset(orders_query(include_products).filter_by(user_id=current_user.id), Order.id)
+    return (order_to_dict(order, include_products) for order in orders), 200
+
+@replica_reads
+def get_order_logic(current_user, order_id, args):
+    include_products = includes_products(args)
+    order = orders_query(include_products).filter_by(id=order_id).first_or_404()
     if order.user_id != current_user.id:
         return {'message': 'Unauthorized'}, 403
-    order_data = {
-        'id': order.id,
-        'user_id': order.user_id,
-        'order_date': order.order_date,
-        'total_amount': order.total_amount,
-        'items': [{'product_id': item.product_id, 'quantity': item.quantity} for item in order.items]
-    }
+    order_data = order_to_dict(order, include_products)
     return order_data, 200
 
-def create_order_logic(current_user, data):
+class OutOfStock(Exception):
+    def __init__(self, product_id, requested, available):
+        super().__init__(f"Insufficient stock for product {product_id}: {requested} requested, {available} available")
+        self.product_id = product_id
+
+def reserve_stock(quantities):
+    """
+    Decrement the stock of every product of an order inside the current transaction, or raise OutOfStock.
+    One conditional UPDATE per product: the check and the decrement are atomic in the DB, so concurrent
+    checkouts can't oversell. Products are updated in id order, so two single-order transactions lock the same rows
+    in the same order and can't deadlock on them. A transaction placing several orders (the order worker's batches)
+    must lock all their products first with lock_products. Products with NULL stock (not tracked) always succeed
+    """
+    for product_id in sorted(quantities):
+        quantity = quantities[product_id]
+        result = db.session.execute(
+            update(Product)
+            .where(Product.id == product_id, or_(Product.stock.is_(None), Product.stock >= quantity))
+            .values(stock=Product.stock - quantity)
+            .execution_options(synchronize_session=False))
+        if result.rowcount != 1:
+            available = db.session.query(Product.stock).filter(Product.id == product_id).scalar()
+            raise OutOfStock(product_id, quantity, available or 0)
+
+def lock_products(product_ids):
+    """
+    Lock the rows of these products (SELECT ... FOR UPDATE) in id order, eg: every product of an order worker batch
+    before placing its orders one by one, in whatever order their items come
+    """
+    if product_ids:
+        db.session.execute(select(Product.id).where(Product.id.in_(product_ids)).order_by(Product.id).with_for_update())
+
+def release_stock(quantities):
+    """
+    Give back the stock reserved by an order (eg: when it's deleted)
+    """
+    for product_id in sorted(quantities):
+        db.session.execute(
+            update(Product)
+            .where(Product.id == product_id, Product.stock.isnot(None))
+            .values(stock=Product.stock + quantities[product_id])
+            .execution_options(synchronize_session=False))
+
+def place_order(user_id, items):
+    """
+    Validate and write an order (stock, items, sales rollups and its order.created event) in the current
+    transaction, without committing. Returns (result, status), on any status other than 201 the caller must roll back
+    """
+    total_amount = 0
+    order_items = []
+    # Resolve every product of the cart in a single IN (...) query instead of one query per item
+    product_ids = {item['product_id'] for item in items if 'product_id' in item}
+    products = {row.id: row for row in db.session.query(Product.id, Product.price, Product.store_id).filter(Product.id.in_(product_ids))} if product_ids else {}
+    for item in items:
+        if not all(field in item for field in ['product_id', 'quantity']):
+            return {'message': 'Each item must contain product_id and quantity'}, 400
+        if item['product_id'] not in products:
+            return {'message': f"Product with id {item['product_id']} not found"}, 400
+        quantity = item['quantity']
+        if quantity <= 0:
+            return {'message': f"Quantity for product {item['product_id']} must be greater than zero"}, 400
+        product = products[item['product_id']]
+        total_amount += product.price * quantity
+        order_items.append({'product_id': product.id, 'quantity': quantity, 'unit_price': product.price,
+                            'store_id': product.store_id})
+    quantities = {}
+    for order_item in order_items:
+        quantities[order_item['product_id']] = quantities.get(order_item['product_id'], 0) + order_item['quantity']
+    try:
+        reserve_stock(quantities)
+    except OutOfStock as e:
+        return {'message': str(e), 'product_id': e.product_id}, 409
+    # Explicit instead of the server default, the rollups are bucketed (and reversed on delete) by this same value
+    order_date = datetime.datetime.utcnow()
+    new_order = Order(user_id=user_id, total_amount=total_amount, order_date=order_date)
+    db.session.add(new_order)
+    db.session.flush()  # Gets new_order.id for the items
+    # One executemany for all items instead of one INSERT per OrderItem object
+    for order_item in order_items:
+        order_item['order_id'] = new_order.id
+    db.session.execute(OrderItem.__table__.insert(), order_items)
+    # Same transaction as the order, so the analytics rollups never drift from the orders
+    record_order_sales(order_date, [
+        (item['product_id'], item['store_id'], item['quantity'], item['unit_price']) for item in order_items])
+    emit_event('order.created', 'order', new_order.id,
+               {'user_id': user_id, 'total_amount': total_amount, 'items': order_items})
+    return {'message': 'Order created successfully', 'order_id': new_order.id}, 201
+
+def process_order_request(order_request):
+    """
+    Turn a pending order request into an order inside a SAVEPOINT of the current transaction, so a rejected
+    request (invalid items, out of stock) only rolls back its own changes. Records the result on the request.
+    Only final outcomes (created, or rejected with a 4xx) are recorded: an error (eg: a deadlock or a lock wait
+    timeout) leaves the request pending, so it runs again instead of replaying the error. Returns True if recorded
+    """
+    try:
+        with db.session.begin_nested() as savepoint:
+            result, status = place_order(order_request.user_id, json.loads(order_request.items))
+            if status != 201:
+                savepoint.rollback()
+    except Exception as e:
+        logging.error(f"Error creating order for order request {order_request.id}: {e}")
+        return False
+    order_request.status = 'completed' if status == 201 else 'failed'
+    order_request.order_id = result.get('order_id')
+    order_request.result = json.dumps(result)
+    order_request.result_status = status
+    order_request.processed_at = datetime.datetime.utcnow()
+    return True
+
+def order_request_to_dict(order_request):
+    return {
+        'order_request_id': order_request.id,
+        'status': order_request.status,
+        'order_id': order_request.order_id,
+        'result': json.loads(order_request.result) if order_request.result else None,
+        'created_at': order_request.created_at,
+        'processed_at': order_request.processed_at
+    }
+
+def order_request_response(order_request):
+    """
+    (result, status) of an order request: the order's own response once processed, 202 and where to poll before
+    """
+    if order_request.status != 'pending':
+        return dict(json.loads(order_request.result), order_request_id=order_request.id), order_request.result_status
+    return {'message': 'Order accepted', 'order_request_id': order_request.id, 'status': 'pending',
+            'status_url': f'/api/order-requests/{order_request.id}'}, 202
+
+def create_order_logic(current_user, data, idempotency_key=None):
+    """
+    Order intake. The request is stored in order_requests and, with ORDER_QUEUE_ENABLED, answered right away with 202
+    and an order request id to poll (GET /api/order-requests/<id>) while the order worker creates the order.
+    Otherwise the order is created in the same transaction (201 like before).
+    An Idempotency-Key header makes retries safe: the same key returns the first request's response
+    """
     required_fields = ['items']
-    if not all(field in data for field in required_fields):
+    if not data or not all(field in data for field in required_fields):
         return {'message': 'Missing required fields'}, 400
     if not isinstance(data['items'], list):
         return {'message': 'Items must be a list'}, 400
     if not data['items']:
         return {'message': 'Items list cannot be empty'}, 400
-    total_amount = 0
-    order_items = []
+    if not all(isinstance(item, dict) for item in data['items']):
+        return {'message': 'Each item must contain product_id and quantity'}, 400
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= IDEMPOTENCY_KEY_MAX_LENGTH:
+        return {'message': f'Idempotency-Key must have 1 to {IDEMPOTENCY_KEY_MAX_LENGTH} characters'}, 400
+    items = json.dumps(data['items'], sort_keys=True, separators=(',', ':'))
+    request_hash = hashlib.sha256(items.encode('utf-8')).hexdigest()
+    if idempotency_key is not None:
+        existing = OrderRequest.query.filter_by(user_id=current_user.id, idempotency_key=idempotency_key).first()
+        if existing:
+            return idempotent_replay(existing, request_hash)
+    order_request = OrderRequest(user_id=current_user.id, idempotency_key=idempotency_key, request_hash=request_hash,
+                                 items=items, status='pending')
     try:
-        for item in data['items']:
-            if not all(field in item for field in ['product_id', 'quantity']):
-                return {'message': 'Each item must contain product_id and quantity'}, 400
-            product = Product.query.get(item['product_id'])
-            if not product:
-                return {'message': f"Product with id {item['product_id']} not found"}, 400
-            quantity = item['quantity']
-            if quantity <= 0:
-                return {'message': f"Quantity for product {item['product_id']} must be greater than zero"}, 400
-            total_amount += product.price * quantity
-            order_items.append(OrderItem(product_id=item['product_id'], quantity=quantity))
-        new_order = Order(user_id=current_user.id, total_amount=total_amount, items=order_items)
-        db.session.add(new_order)
+        db.session.add(order_request)
+        db.session.flush()
+        if not current_app.config['ORDER_QUEUE_ENABLED'] and not process_order_request(order_request):
+            # Nothing is stored, so a retry with the same key places the order again
+            db.session.rollback()
+            return {'message': 'Failed to create order'}, 500
         db.session.commit()
-        return {'message': 'Order created successfully', 'order_id': new_order.id}, 201
+    except IntegrityError as e:
+        db.session.rollback()
+        # Only a duplicate key can be replayed (another request with the same key was stored first)
+        if idempotency_key is None:
+            logging.error(f"Error creating order: {e}")
+            return {'message': 'Failed to create order'}, 500
+        existing = OrderRequest.query.filter_by(user_id=current_user.id, idempotency_key=idempotency_key).first()
+        if existing is None:
+            return {'message': 'Failed to create order'}, 500
+        return idempotent_replay(existing, request_hash)
     except Exception as e:
         db.session.rollback()
         logging.error(f"Error creating order: {e}")
         return {'message': 'Failed to create order'}, 500
+    return order_request_response(order_request)
+
+def idempotent_replay(order_request, request_hash):
+    if order_request.request_hash != request_hash:
+        return {'message': 'Idempotency-Key was already used with other items'}, 422
+    return order_request_response(order_request)
+
+@replica_reads
+def get_order_request_logic(current_user, order_request_id):
+    order_request = OrderRequest.query.get_or_404(order_request_id)
+    if order_request.user_id != current_user.id:
+        return {'message': 'Unauthorized'}, 403
+    return order_request_to_dict(order_request), 200
 
 def delete_order_logic(current_user, order_id):
     order = Order.query.get_or_404(order_id)
     if order.user_id != current_user.id:
         return {'message': 'Unauthorized'}, 403
     try:
+        # Reversed with the price and store of the checkout, not the product's current ones
+        lines = (db.session.query(OrderItem.product_id, OrderItem.store_id, OrderItem.quantity, OrderItem.unit_price)
+                 .filter(OrderItem.order_id == order.id).all())
+        quantities = {}
+        for product_id, _, quantity, _ in lines:
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        release_stock(quantities)
+        record_order_sales(order.order_date, lines, sign=-1)
         db.session.delete(order)
+        emit_event('order.deleted', 'order', order.id, {'user_id': order.user_id})
         db.session.commit()
         return {'message': 'Order deleted successfully'}, 200
     except Exception as e:
         db.session.rollback()
         logging.error(f"Error deleting order: {e}")
         return {'message': 'Failed to delete order'}, 500
+
+def batch_logic(current_user, data, batch_path):
+    """
+    Run several read requests in one round trip: {"requests": [{"method": "GET", "path": "/api/products/1"}, ...]}.
+    Sub-requests run in order through the normal routes (response cache included) and reuse the principal
+    authenticated once by the batch. Returns {"responses": [{"status": ..., "body": ...}]} in the same order
+    """
+    if not data or not isinstance(data.get('requests'), list) or not data['requests']:
+        return {'message': 'requests must be a non empty list'}, 400
+    if len(data['requests']) > BATCH_MAX_REQUESTS:
+        return {'message': f'At most {BATCH_MAX_REQUESTS} requests per batch'}, 400
+    for sub_request in data['requests']:
+        if not isinstance(sub_request, dict) or not isinstance(sub_request.get('path'), str) or not sub_request['path'].startswith('/'):
+            return {'message': 'Each request must have a path starting with /'}, 400
+        if str(sub_request.get('method', 'GET')).upper() != 'GET':
+            return {'message': 'Only GET requests can be batched'}, 400
+        if urlsplit(sub_request['path']).path.rstrip('/') == batch_path:
+            return {'message': 'Batches can not be nested'}, 400
+    environ = {PRINCIPAL_ENVIRON_KEY: current_user} if current_user else None
+    responses = []
+    for sub_request in data['requests']:
+        status, body = dispatch_subrequest(sub_request['path'], environ)
+        responses.append({'status': status, 'body': body})
+    return {'responses': responses}, 200
@@ -1,12 +1,16 @@
 from flask import Blueprint, jsonify, request
-from ..shared.auth import token_required
+from ..shared.auth import token_required, token_optional
+from ..shared.utils import wants_ndjson, ndjson_response
+from ..shared.response_cache import cached_response
 # Issue: Missing logics (update_order_logic)
 from .customer_management import (
     register_user_logic, login_user_logic, decode_user_logic,
     create_store_logic, update_store_logic, delete_store_logic,
     create_product_logic, update_product_logic, delete_product_logic,
     get_stores_logic, get_store_logic, get_products_logic, get_product_logic,
-    create_order_logic, get_orders_logic, get_order_logic, delete_order_logic
+    create_order_logic, get_orders_logic, get_order_logic, delete_order_logic, get_order_request_logic,
+    stream_stores_logic, stream_products_logic, stream_orders_logic, search_products_logic,
+    import_products_logic, get_stores_by_ids_logic, get_products_by_ids_logic, batch_logic
 )
 
 customer_bp = Blueprint('customer_bp', __name__, url_prefix='/api')
@@ -58,11 +62,21 @@ def delete_store(current_user, store_id):
     return jsonify(result), status
 
 @customer_bp.route('/stores', methods=['GET'])
+@cached_response('stores')
 def get_stores():
-    result, status = get_stores_logic()
+    # Paginated: ?limit=&cursor=&sort=&owner_id=&name= (name is a prefix match)
+    # With 'Accept: application/x-ndjson' all matching stores are streamed instead, one per line
+    # ?ids=1,2,3 returns those stores instead (multi-get)
+    if request.args.get('ids'):
+        result, status = get_stores_by_ids_logic(request.args)
+        return jsonify(result), status
+    if wants_ndjson():
+        return ndjson_response(*stream_stores_logic(request.args))
+    result, status = get_stores_logic(request.args)
     return jsonify(result), status
 
 @customer_bp.route('/stores/<int:store_id>', methods=['GET'])
+@cached_response('stores')
 def get_store(store_id):
     result, status = get_store_logic(store_id)
     return jsonify(result), status
@@ -74,6 +88,14 @@ def create_product(current_user):
     result, status = create_product_logic(current_user, data)
     return jsonify(result), status
 
+# Bulk create/update (by sku) of a store's products. Body is CSV (Content-Type: text/csv, header row with
+# name,description,price,sku) or NDJSON (Content-Type: application/x-ndjson), read as a stream
+@customer_bp.route('/stores/<int:store_id>/products/import', methods=['POST'])
+@token_required
+def import_products(current_user, store_id):
+    result, status = import_products_logic(current_user, store_id, request.stream, request.mimetype)
+    return jsonify(result), status
+
 @customer_bp.route('/products/<int:product_id>', methods=['PUT'])
 @token_required
 def update_product(current_user, product_id):
@@ -88,11 +110,28 @@ def delete_product(current_user, product_id):
     return jsonify(result), status
 
 @customer_bp.route('/products', methods=['GET'])
+@cached_response('products')
 def get_products():
-    result, status = get_products_logic()
+    # Paginated: ?limit=&cursor=&sort=&store_id=&min_price=&max_price=&name= (name is a prefix match)
+    # With 'Accept: application/x-ndjson' all matching products are streamed instead, one per line
+    # ?ids=1,2,3 returns those products instead (multi-get, eg: the products of a cart)
+    if request.args.get('ids'):
+        result, status = get_products_by_ids_logic(request.args)
+        return jsonify(result), status
+    if wants_ndjson():
+        return ndjson_response(*stream_products_logic(request.args))
+    result, status = get_products_logic(request.args)
+    return jsonify(result), status
+
+# Full-text search ranked by relevance: ?q=&limit=&cursor= plus the same filters as GET /products
+@customer_bp.route('/products/search', methods=['GET'])
+@cached_response('products')
+def search_products():
+    result, status = search_products_logic(request.args)
     return jsonify(result), status
 
 @customer_bp.route('/products/<int:product_id>', methods=['GET'])
+@cached_response('products')
 def get_product(product_id):
     result, status = get_product_logic(product_id)
     return jsonify(result), status
@@ -100,20 +139,33 @@ def get_product(product_id):
 @customer_bp.route('/orders', methods=['GET'])
 @token_required
 def get_orders(current_user):
-    result, status = get_orders_logic(current_user)
+    # ?include=products adds each item's product name and price (loaded in the same round trip)
+    if wants_ndjson():
+        return ndjson_response(*stream_orders_logic(current_user, request.args))
+    result, status = get_orders_logic(current_user, request.args)
     return jsonify(result), status
 
 @customer_bp.route('/orders/<int:order_id>', methods=['GET'])
 @token_required
 def get_order(current_user, order_id):
-    result, status = get_order_logic(current_user, order_id)
+    result, status = get_order_logic(current_user, order_id, request.args)
     return jsonify(result), status
 
 @customer_bp.route('/orders', methods=['POST'])
 @token_required
 def create_order(current_user):
+    # Clients retrying a checkout (eg: after a timeout) send the same Idempotency-Key, so the order is created once
     data = request.get_json()
-    result, status = create_order_logic(current_user, data)
+    result, status = create_order_logic(current_user, data, request.headers.get('Idempotency-Key'))
+    if status == 202:
+        return jsonify(result), status, {'Location': result['status_url']}
+    return jsonify(result), status
+
+# Polled after a 202 from POST /orders: status is pending, completed (with order_id) or failed (with the error)
+@customer_bp.route('/order-requests/<int:order_request_id>', methods=['GET'])
+@token_required
+def get_order_request(current_user, order_request_id):
+    result, status = get_order_request_logic(current_user, order_request_id)
     return jsonify(result), status
 
 @customer_bp.route('/orders/<int:order_id>', methods=['DELETE'])
@@ -121,3 +173,11 @@ def create_order(current_user):
 def delete_order(current_user, order_id):
     result, status = delete_order_logic(current_user, order_id)
     return jsonify(result), status
+
+# Several GET requests in one round trip (eg: a page needing a store and its products). The token, if sent,
+# is checked once for the whole batch
+@customer_bp.route('/batch', methods=['POST'])
+@token_optional
+def batch(current_user):
+    result, status = batch_logic(current_user, request.get_json(silent=True), request.path)
+    return jsonify(result), status
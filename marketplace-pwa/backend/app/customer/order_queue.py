@@ -0,0 +1,71 @@
+"""
+Order worker: turns the pending order requests accepted by POST /api/orders (see create_order_logic) into orders.
+Every batch claims up to ORDER_WORKER_BATCH_SIZE pending requests (oldest first), processes each one in its own
+SAVEPOINT and commits the whole batch at once, so during a sales spike checkouts only pay for one INSERT and the
+workers commit orders in a few large transactions. The products of the whole batch are locked first, in id order,
+so concurrent batches and checkouts take product locks in the same order. A request hitting an error stays pending and is retried by a
+later batch, a batch that fails as a whole (eg: a deadlock) is rolled back and all its requests stay pending.
+Several workers (the order-worker service of docker-compose, scale it with --scale) share the queue on MySQL 8
+(SELECT ... FOR UPDATE SKIP LOCKED), on SQLite run a single one
+"""
+import json
+import logging
+import signal
+import time
+import click
+from ..shared.models import OrderRequest, db
+from .customer_management import lock_products, process_order_request
+
+def process_order_requests(batch_size):
+    """
+    Process one batch of pending order requests. Returns the number claimed (processed or left pending after an error)
+    """
+    order_requests = (OrderRequest.query.filter_by(status='pending').order_by(OrderRequest.id).limit(batch_size)
+                      .with_for_update(skip_locked=True).all())
+    if not order_requests:
+        db.session.rollback()
+        return 0
+    lock_products(batch_product_ids(order_requests))
+    for order_request in order_requests:
+        process_order_request(order_request)
+    db.session.commit()
+    return len(order_requests)
+
+def batch_product_ids(order_requests):
+    product_ids = set()
+    for order_request in order_requests:
+        items = json.loads(order_request.items)
+        product_ids.update(item['product_id'] for item in items
+                           if isinstance(item, dict) and isinstance(item.get('product_id'), int))
+    return product_ids
+
+def run_order_worker(batch_size, poll_interval, once=False):
+    """
+    Process batches until the queue is empty, then poll every poll_interval seconds. Stops after the current
+    batch on SIGTERM
+    """
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+    total = 0
+    while not stopping:
+        try:
+            processed = process_order_requests(batch_size)
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Error processing order requests: {e}")
+            processed = 0
+        total += processed
+        if processed < batch_size:
+            if once:
+                break
+            time.sleep(poll_interval)
+    return total
+
+def register_order_commands(app):
+    @app.cli.command('order-worker')
+    @click.option('--once', is_flag=True, help='Exit when no order request is pending instead of polling')
+    def order_worker_command(once):
+        """Turn pending order requests into orders."""
+        total = run_order_worker(app.config['ORDER_WORKER_BATCH_SIZE'], app.config['ORDER_WORKER_POLL_INTERVAL'],
+                                 once=once)
+        click.echo(f'Processed {total} order requests')
@@ -0,0 +1,7 @@
+"""
+Production WSGI entry point for the customer backend, used by gunicorn (see gunicorn.conf.py)
+Run from the backend folder: gunicorn -c gunicorn.conf.py app.customer.wsgi:app
+"""
+from . import create_app
+
+app = create_app()
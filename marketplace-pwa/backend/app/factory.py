@@ -0,0 +1,77 @@
+"""
+Application factory shared by both backends:
+    create_app('customer') / create_app('admin') / create_app('all') (both blueprints in one process, eg: local runs)
+Startup only imports what the app being created needs:
+- the customer/admin blueprints (and their management logic) only for their kind
+- Flask-Migrate, which imports alembic, only when a 'flask db ...' command runs (LazyMigrateGroup)
+- bleach only on the first write with markup to strip (see clean_text in shared/utils.py)
+Check the startup import cost with: python -m benchmarks import-time
+"""
+import click
+from flask import Flask, current_app, g
+from flask.cli import with_appcontext
+from .shared.config import Config
+from .shared.database import db, init_db
+from .shared.instrumentation import init_instrumentation
+from .shared.compression import init_compression
+from .shared.serialization import FastJSONProvider
+from .shared.query_plan import register_query_plan_command
+from .shared.events import register_event_commands
+
+APP_KINDS = ('customer', 'admin', 'all')
+
+class LazyMigrateGroup(click.Group):
+    """
+    Stand-in for Flask-Migrate's 'db' command group. Flask-Migrate is set up the first time one of its
+    commands is looked up, instead of on every process start (web workers never run migrations)
+    """
+    def _migrate_group(self):
+        if 'migrate' not in current_app.extensions:
+            from flask_migrate import Migrate
+            Migrate(current_app, db)
+        from flask_migrate.cli import db as migrate_group
+        return migrate_group
+
+    def list_commands(self, ctx):
+        return self._migrate_group().list_commands(ctx)
+
+    def get_command(self, ctx, cmd_name):
+        return self._migrate_group().get_command(ctx, cmd_name)
+
+# Same options and callback as Flask-Migrate's own group
+@click.group('db', cls=LazyMigrateGroup)
+@click.option('-d', '--directory', default=None, help='Migration script directory (default is "migrations")')
+@click.option('-x', '--x-arg', multiple=True, help='Additional arguments consumed by custom env.py scripts')
+@with_appcontext
+def migrate_commands(directory, x_arg):
+    """Perform database migrations."""
+    # Picked up by Migrate.get_config()
+    g.directory = directory
+    g.x_arg = x_arg
+
+def create_app(kind='customer', config_class=Config):
+    if kind not in APP_KINDS:
+        raise ValueError(f"kind must be one of: {', '.join(APP_KINDS)}")
+    app = Flask(__name__)
+    app.config.from_object(config_class)
+
+    app.json = FastJSONProvider(app)
+    init_db(app)
+    init_instrumentation(app)
+    init_compression(app)
+    app.cli.add_command(migrate_commands)
+    register_query_plan_command(app)
+    register_event_commands(app)
+
+    if kind in ('customer', 'all'):
+        from .customer.customer_routes import customer_bp
+        from .customer.order_queue import register_order_commands
+        register_order_commands(app)
+        app.register_blueprint(customer_bp)
+    if kind in ('admin', 'all'):
+        from .admin.admin_routes import admin_bp
+        from .shared.analytics import register_analytics_commands
+        register_analytics_commands(app)
+        app.register_blueprint(admin_bp)
+
+    return app
@@ -0,0 +1,114 @@
+"""
+Sales rollups for the admin analytics API
+Every order adds its totals (revenue, units, orders) to a 'day' and a 'week' row per store and per product,
+in the same transaction as the order. Deleting an order subtracts them. Dashboard queries then read a handful of
+rollup rows whatever the size of the order history
+Revenue is quantity * the unit price snapshotted on order_items at checkout (credited to the store of the same
+snapshot), so orders are added, subtracted and backfilled with the same numbers whatever happens to the product later
+"""
+import datetime
+import click
+from sqlalchemy import delete
+from sqlalchemy.dialects import mysql, sqlite
+from .database import db
+from .models import Order, OrderItem, StoreSalesRollup, ProductSalesRollup
+
+PERIODS = ('day', 'week')
+
+def period_start(period, moment):
+    day = moment.date() if isinstance(moment, datetime.datetime) else moment
+    if period == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    return day
+
+def aggregate_order_lines(order_date, lines, sign=1):
+    """
+    Rollup increments of one order. lines are (product_id, store_id, quantity, unit_price) tuples.
+    Returns (store rows, product rows) dicts keyed by their rollup primary key
+    """
+    store_rows = {}
+    product_rows = {}
+    for product_id, store_id, quantity, unit_price in lines:
+        revenue = quantity * unit_price
+        for period in PERIODS:
+            start = period_start(period, order_date)
+            store_row = store_rows.setdefault((period, start, store_id), {
+                'period': period, 'period_start': start, 'store_id': store_id, 'orders': sign, 'units': 0, 'revenue': 0.0})
+            store_row['units'] += sign * quantity
+            store_row['revenue'] += sign * revenue
+            product_row = product_rows.setdefault((period, start, product_id), {
+                'period': period, 'period_start': start, 'product_id': product_id, 'store_id': store_id, 'units': 0, 'revenue': 0.0})
+            product_row['units'] += sign * quantity
+            product_row['revenue'] += sign * revenue
+    return store_rows, product_rows
+
+def increment_statement(model, key_columns, counter_columns):
+    """
+    INSERT that adds the counters to the existing row with the same key instead of failing
+    """
+    table = model.__table__
+    if db.engine.dialect.name == 'mysql':
+        statement = mysql.insert(table)
+        return statement.on_duplicate_key_update({
+            column: table.c[column] + statement.inserted[column] for column in counter_columns})
+    statement = sqlite.insert(table)
+    return statement.on_conflict_do_update(index_elements=key_columns, set_={
+        column: table.c[column] + statement.excluded[column] for column in counter_columns})
+
+def apply_rollup_rows(store_rows, product_rows):
+    if store_rows:
+        db.session.execute(increment_statement(StoreSalesRollup, ['period', 'period_start', 'store_id'],
+                                               ['orders', 'units', 'revenue']), list(store_rows.values()))
+    if product_rows:
+        db.session.execute(increment_statement(ProductSalesRollup, ['period', 'period_start', 'product_id'],
+                                               ['units', 'revenue']), list(product_rows.values()))
+
+def record_order_sales(order_date, lines, sign=1):
+    """
+    Add (sign=1) or subtract (sign=-1) an order to the rollups, inside the caller's transaction
+    """
+    apply_rollup_rows(*aggregate_order_lines(order_date, lines, sign))
+
+def backfill_sales_rollups(batch_size=1000):
+    """
+    Rebuild every rollup from orders and order_items (eg: after adding the rollup tables). Streams the order lines
+    and aggregates them in memory (one entry per period/store and period/product), then writes them in one transaction
+    """
+    db.session.execute(delete(StoreSalesRollup))
+    db.session.execute(delete(ProductSalesRollup))
+    store_totals = {}
+    product_totals = {}
+    lines = (db.session.query(Order.id, Order.order_date, OrderItem.product_id, OrderItem.store_id, OrderItem.quantity, OrderItem.unit_price)
+             .join(OrderItem, OrderItem.order_id == Order.id)
+             .order_by(Order.id)
+             .yield_per(batch_size))
+    # Rows come ordered by order, so an order is complete when the next one starts
+    current_id, current_date, current_lines = None, None, []
+    for order_id, order_date, product_id, store_id, quantity, price in lines:
+        if order_id != current_id and current_lines:
+            merge_rollup_rows(store_totals, product_totals, *aggregate_order_lines(current_date, current_lines))
+            current_lines = []
+        current_id, current_date = order_id, order_date
+        current_lines.append((product_id, store_id, quantity, price))
+    if current_lines:
+        merge_rollup_rows(store_totals, product_totals, *aggregate_order_lines(current_date, current_lines))
+    apply_rollup_rows(store_totals, product_totals)
+    db.session.commit()
+    return len(store_totals), len(product_totals)
+
+def merge_rollup_rows(store_totals, product_totals, store_rows, product_rows):
+    for totals, rows, counters in [(store_totals, store_rows, ['orders', 'units', 'revenue']),
+                                   (product_totals, product_rows, ['units', 'revenue'])]:
+        for key, row in rows.items():
+            if key in totals:
+                for counter in counters:
+                    totals[key][counter] += row[counter]
+            else:
+                totals[key] = row
+
+def register_analytics_commands(app):
+    @app.cli.command('backfill-sales-rollups')
+    def backfill_sales_rollups_command():
+        """Rebuild the sales rollup tables from the order history."""
+        store_rows, product_rows = backfill_sales_rollups()
+        click.echo(f'Rebuilt {store_rows} store and {product_rows} product rollup rows')
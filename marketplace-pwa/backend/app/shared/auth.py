@@ -1,8 +1,23 @@
 import jwt  # importing jwt (json web token) for token generation and decoding
 from flask import jsonify, request, current_app
 from functools import wraps  # for creating decorators
-from .models import User
+from collections import namedtuple
+from .models import User, db
+from .cache import TTLCache
+from .config import Config
+from .instrumentation import record_timing
 import datetime  # for handling date and time
+import hashlib
+import time
+
+# Lightweight user passed to the routes by token_required. Routes only need these fields,
+# so it's cached instead of loading the full User on every authenticated request
+UserPrincipal = namedtuple('UserPrincipal', ['id', 'username', 'is_admin'])
+# WSGI environ key of an already authenticated principal (can't be set by clients, headers are HTTP_* keys)
+PRINCIPAL_ENVIRON_KEY = 'marketplace.principal'
+user_cache = TTLCache(maxsize=Config.AUTH_USER_CACHE_SIZE, ttl=Config.AUTH_USER_CACHE_TTL, name='auth_user')
+# Verified token digest -> (user_id, exp)
+token_cache = TTLCache(maxsize=Config.AUTH_TOKEN_CACHE_SIZE, ttl=Config.AUTH_TOKEN_CACHE_TTL, name='auth_token')
 
 def generate_token(user):
     """
@@ -17,14 +32,50 @@ def generate_token(user):
 def decode_token(token):
     """
     Decode a JWT token
+    Recently verified tokens are memoized (by digest) until they expire, so repeated requests with
+    the same bearer token skip the HMAC signature check and the JSON parsing
     """
+    secret = current_app.config['SECRET_KEY']
+    # The secret is part of the key so a token verified with another key is never reused
+    key = hashlib.sha256(f'{secret}.{token}'.encode('utf-8')).digest()
+    cached = token_cache.get(key)
+    if cached is not None:
+        user_id, exp = cached
+        if exp is None or exp > time.time():
+            return user_id
+        token_cache.delete(key)
     try:
-        payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-        return payload['user_id']
+        payload = jwt.decode(token, secret, algorithms=['HS256'])
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
+    user_id = payload['user_id']
+    exp = payload.get('exp')
+    ttl = token_cache.ttl if exp is None else min(token_cache.ttl, exp - time.time())
+    if ttl > 0:
+        token_cache.set(key, (user_id, exp), ttl=ttl)
+    return user_id
+
+def get_user_principal(user_id):
+    """
+    Get the UserPrincipal for a user id from the cache, or from the DB (only the needed columns) on a miss
+    """
+    principal = user_cache.get(user_id)
+    if principal is None:
+        row = db.session.query(User.id, User.username, User.is_admin).filter_by(id=user_id).first()
+        if not row:
+            return None
+        principal = UserPrincipal(row.id, row.username, bool(row.is_admin))
+        user_cache.set(user_id, principal)
+    return principal
+
+def invalidate_user_cache(user_id):
+    """
+    Must be called after a user is updated or deleted, so the change is seen by the next request of this process.
+    Other worker processes keep their cached principal until AUTH_USER_CACHE_TTL expires
+    """
+    user_cache.delete(user_id)
 
 def token_required(f):
     """
@@ -32,24 +83,52 @@ def token_required(f):
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({'message': 'Token is missing'}), 401
+        start = time.perf_counter()
+        current_user, error = authenticate_request()
+        record_timing('auth', time.perf_counter() - start)
+        if error:
+            return error
+        return f(current_user, *args, **kwargs)
+    return decorated_function
+
+def token_optional(f):
+    """
+    Decorator authenticating like token_required when an Authorization header is sent, otherwise the route
+    gets current_user=None
+    """
+    authenticated = token_required(f)
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not request.headers.get('Authorization'):
+            return f(None, *args, **kwargs)
+        return authenticated(*args, **kwargs)
+    return decorated_function
 
-        if not token.startswith('Bearer '):
-            return jsonify({'message': 'Invalid token format'}), 401
+def authenticate_request():
+    """
+    Returns (UserPrincipal, None) for the bearer token of the current request or (None, error response)
+    """
+    # Sub-requests of POST /api/batch carry the principal the batch already authenticated
+    principal = request.environ.get(PRINCIPAL_ENVIRON_KEY)
+    if principal is not None:
+        return principal, None
+    token = request.headers.get('Authorization')
+    if not token:
+        return None, (jsonify({'message': 'Token is missing'}), 401)
 
-        token = token.split(' ')[1]
-        user_id = decode_token(token)
-        if not user_id:
-            return jsonify({'message': 'Invalid or expired token'}), 401
+    if not token.startswith('Bearer '):
+        return None, (jsonify({'message': 'Invalid token format'}), 401)
 
-        current_user = User.query.get(user_id)
-        if not current_user:
-            return jsonify({'message': 'User not found'}), 401
+    token = token.split(' ')[1]
+    user_id = decode_token(token)
+    if not user_id:
+        return None, (jsonify({'message': 'Invalid or expired token'}), 401)
 
-        return f(current_user, *args, **kwargs)
-    return decorated_function
+    current_user = get_user_principal(user_id)
+    if not current_user:
+        return None, (jsonify({'message': 'User not found'}), 401)
+    return current_user, None
 
 def admin_required(f):
     """
@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import OrderedDict
+from prometheus_client import Counter, Gauge
+
+cache_hits = Counter('cache_hits_total', 'Hits of the named in-process caches, by cache', ['cache'])
+cache_misses = Counter('cache_misses_total', 'Misses of the named in-process caches, by cache', ['cache'])
+# Summed over the live worker processes, each one has its own copy of the cache
+cache_size = Gauge('cache_size', 'Entries of the named in-process caches, by cache', ['cache'], multiprocess_mode='livesum')
+
+class TTLCache:
+    """
+    Small thread-safe in-process cache with a max size (least recently used entries are evicted first)
+    and a time to live per entry. It also counts hits and misses so its size/ttl can be tuned. A named cache also
+    exports them on /metrics (cache_hits_total, cache_misses_total and cache_size with a cache="<name>" label)
+    Notice: It's per process, so every worker (and the customer and admin backends) has its own copy
+    """
+    def __init__(self, maxsize, ttl, name=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if name:
+            self._hits_metric, self._misses_metric = cache_hits.labels(name), cache_misses.labels(name)
+            self._size_metric = cache_size.labels(name)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                    self._export_size()
+                self.misses += 1
+                if self.name:
+                    self._misses_metric.inc()
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            if self.name:
+                self._hits_metric.inc()
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        """
+        Store a value. ttl overrides the cache default for this entry (eg: to not outlive a token)
+        """
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            self._export_size()
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+            self._export_size()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._export_size()
+
+    def _export_size(self):
+        if self.name:
+            self._size_metric.set(len(self._data))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,82 @@
+"""
+Compression of response bodies, negotiated with the client's Accept-Encoding:
+- br (Brotli) when the optional brotli package is installed, gzip otherwise (or if the client only takes gzip)
+- only for textual mimetypes (JSON, CSV, Prometheus text, ...) of at least COMPRESS_MIN_SIZE bytes: below ~1KB the
+  saving doesn't pay for the CPU and the headers
+- streamed responses (NDJSON exports) and bodies already encoded are sent as they are
+A compressed body is a different representation, so its ETag becomes weak (W/"..."): If-None-Match uses weak
+comparison, so the 304s of the response cache keep working. Compressed bodies of responses with an ETag (the cached
+catalog responses) are kept in a small per process cache, so a hot listing is compressed once per encoding.
+Turn it off with COMPRESS_ENABLED=false when a reverse proxy in front of the backends already compresses
+"""
+import gzip
+import time
+from flask import request
+from .cache import TTLCache
+from .instrumentation import record_timing
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/plain', 'text/csv', 'text/html', 'application/javascript'}
+
+def compress_body(body, encoding, gzip_level=6, brotli_quality=4):
+    if encoding == 'br':
+        return brotli.compress(body, quality=brotli_quality)
+    # mtime=0 so the same body always gives the same bytes
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+def available_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def negotiate_encoding(accept_encodings, encodings):
+    """
+    Best encoding of 'encodings' accepted by the client (respecting q-values), None for identity
+    """
+    best = accept_encodings.best_match(encodings)
+    return best if best in encodings else None
+
+def init_compression(app):
+    """
+    Hook response compression into an app. Must run after init_instrumentation, so compression is part of the
+    measured request time (after_request hooks run in reverse order of registration)
+    """
+    if not app.config.get('COMPRESS_ENABLED', True):
+        return
+    min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+    gzip_level = app.config.get('COMPRESS_GZIP_LEVEL', 6)
+    brotli_quality = app.config.get('COMPRESS_BROTLI_QUALITY', 4)
+    encodings = available_encodings()
+    compressed_bodies = TTLCache(maxsize=app.config.get('COMPRESS_CACHE_SIZE', 256), ttl=app.config.get('RESPONSE_CACHE_TTL', 60))
+
+    @app.after_request
+    def compress_response(response):
+        if (response.direct_passthrough or response.is_streamed or response.status_code < 200
+                or response.status_code in (204, 206, 304) or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+        # The body depends on Accept-Encoding from here on, even when it's sent uncompressed
+        response.vary.add('Accept-Encoding')
+        if response.content_length is None or response.content_length < min_size:
+            return response
+        encoding = negotiate_encoding(request.accept_encodings, encodings)
+        if encoding is None:
+            return response
+        start = time.perf_counter()
+        etag, weak = response.get_etag()
+        key = (etag, encoding) if etag else None
+        body = compressed_bodies.get(key) if key else None
+        if body is None:
+            body = compress_body(response.get_data(), encoding, gzip_level, brotli_quality)
+            if key:
+                compressed_bodies.set(key, body)
+        record_timing('compress', time.perf_counter() - start)
+        if len(body) >= response.content_length:
+            return response
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
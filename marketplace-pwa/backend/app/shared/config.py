@@ -4,3 +4,63 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY')
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Connection pool per process (see shared/database.py)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))
+    # Below MySQL's wait_timeout, so the pool never hands out a connection the server already closed
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    # Comma separated read replica URLs (see shared/database.py), reads of @replica_reads logic go to one of them
+    DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    # After a change, the user's reads stay on the primary this long (must be above the replica lag)
+    DB_REPLICA_STICKY_SECONDS = int(os.environ.get('DB_REPLICA_STICKY_SECONDS', 10))
+    # Max execution time of SELECT statements in milliseconds (0 disables it)
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 10000))
+    # In-process cache of authenticated users used by token_required (size 0 disables it)
+    # Invalidation only reaches the worker that made the change: the others still see a demoted/deleted user (and
+    # its admin rights) for up to AUTH_USER_CACHE_TTL seconds, so keep it to a few seconds
+    AUTH_USER_CACHE_SIZE = int(os.environ.get('AUTH_USER_CACHE_SIZE', 10000))
+    AUTH_USER_CACHE_TTL = int(os.environ.get('AUTH_USER_CACHE_TTL', 5))
+    # Memo of already verified JWTs, entries never outlive the token's own expiry (size 0 disables it)
+    AUTH_TOKEN_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', 10000))
+    AUTH_TOKEN_CACHE_TTL = int(os.environ.get('AUTH_TOKEN_CACHE_TTL', 300))
+    # Cache of the public catalog GET responses (ETag/304). Empty RESPONSE_CACHE_URL keeps it in process memory,
+    # a redis:// URL shares it between every worker and both backends (requires the redis package)
+    RESPONSE_CACHE_URL = os.environ.get('RESPONSE_CACHE_URL', '')
+    RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 1000))
+    # In process memory, a change only invalidates the worker that made it: the others serve the old listing until
+    # the TTL expires, hence the short default without a shared cache
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 60 if RESPONSE_CACHE_URL else 5))
+    # Password hashing (see shared/passwords.py). Changing the method/cost rehashes each password on its next login
+    # Empty uses werkzeug's default (scrypt), otherwise any method of generate_password_hash (eg: pbkdf2:sha256:600000)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', '')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 16))
+    PASSWORD_HASH_QUEUE_TIMEOUT = float(os.environ.get('PASSWORD_HASH_QUEUE_TIMEOUT', 2))
+    # Request instrumentation (see shared/instrumentation.py): /metrics, Server-Timing headers and the slow query log
+    INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', 'true').lower() == 'true'
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    # Clients allowed to scrape /metrics (addresses or networks, comma separated). Everybody else gets a 403
+    METRICS_ALLOWED_NETWORKS = os.environ.get('METRICS_ALLOWED_NETWORKS', '127.0.0.1,::1')
+    SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', 'true').lower() == 'true'
+    SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 200))
+    # Same statement this many times in one request is logged as a possible N+1
+    N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 10))
+    # Domain event outbox (see shared/events.py): events moved per batch and idle poll interval of the worker
+    OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 500))
+    OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL', 1.0))
+    # Queued checkouts (see customer/order_queue.py): POST /api/orders answers 202 and the order worker creates the
+    # orders in batches. false creates the order during the request (201)
+    ORDER_QUEUE_ENABLED = os.environ.get('ORDER_QUEUE_ENABLED', 'true').lower() == 'true'
+    ORDER_WORKER_BATCH_SIZE = int(os.environ.get('ORDER_WORKER_BATCH_SIZE', 50))
+    ORDER_WORKER_POLL_INTERVAL = float(os.environ.get('ORDER_WORKER_POLL_INTERVAL', 0.2))
+    # JSON encoder of the responses (see shared/serialization.py): auto (orjson when installed), orjson or json
+    JSON_SERIALIZER = os.environ.get('JSON_SERIALIZER', 'auto')
+    # Response compression (see shared/compression.py), brotli is used when the package is installed
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', 'true').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+    COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4))
+    # Compressed bodies of responses with an ETag (cached catalog listings) kept per process
+    COMPRESS_CACHE_SIZE = int(os.environ.get('COMPRESS_CACHE_SIZE', 256))
@@ -1,8 +1,257 @@
 """
-Not needed in this project. Usually used in very large projects for:
-1. Centralized database connection management (eg: db = SQLAlchemy())
-2. Database session management
-3. Custom Database Utilities
-4. If the project uses multiple databases
-5. Database migrations/seeding utilities
+Centralized database connection management shared by the customer and admin backends:
+1. The single db = SQLAlchemy() instance used by models and logic (one engine/pool per process)
+2. Connection pool tuning from env vars (see Config: DB_POOL_SIZE, DB_MAX_OVERFLOW, ...)
+3. Statement timeout applied to every new MySQL connection
+4. Pool usage stats (checked-out, overflow, wait time) to size the pool against MySQL's max_connections, on
+   /admin/api/stats/db-pool (this process) and as db_pool_* metrics on /metrics (all the workers)
+   Rule of thumb: processes * (DB_POOL_SIZE + DB_MAX_OVERFLOW) of both backends must stay below max_connections
+5. Read replicas (DATABASE_REPLICA_URLS): SELECTs run by logic functions decorated with @replica_reads go to a
+   replica, everything else (writes, SELECT ... FOR UPDATE, undecorated logic, CLI commands) to the primary.
+   Read-your-writes: after a request commits a change, the reads of the same user stay on the primary for
+   DB_REPLICA_STICKY_SECONDS (keep it above the replica lag). The user is remembered per process and with a
+   cookie, so browsers stay sticky whichever worker serves their next request
 """
+import contextlib
+import contextvars
+import random
+import threading
+import time
+from flask import g, has_request_context, request
+from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from functools import wraps  # for creating decorators
+from prometheus_client import Gauge, Histogram
+from sqlalchemy import Select, event
+from sqlalchemy.pool import QueuePool
+from .cache import TTLCache
+from .config import Config
+
+REPLICA_BIND_PREFIX = 'replica_'
+STICKY_COOKIE = 'primary_reads_until'
+# 'replica' inside @replica_reads, 'primary' inside primary_reads()
+_read_target = contextvars.ContextVar('read_target', default=None)
+# user id -> True while their reads must stay on the primary
+sticky_users = TTLCache(maxsize=10000, ttl=Config.DB_REPLICA_STICKY_SECONDS)
+
+class RoutingSession(Session):
+    """
+    Session sending the plain SELECTs of @replica_reads logic to a random replica. A session that wrote
+    (flush or DML statement) keeps reading from the primary until the end of its transaction
+    """
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or getattr(clause, 'is_dml', False):
+                self.info['wrote'] = True
+            elif (_read_target.get() == 'replica' and not self.info.get('wrote') and isinstance(clause, Select)
+                  and clause._for_update_arg is None):
+                replicas = replica_engines(self._db.engines)
+                if replicas and not primary_sticky():
+                    return random.choice(replicas)
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+@event.listens_for(RoutingSession, 'after_commit')
+def remember_writer(session):
+    if session.info.pop('wrote', False) and has_request_context() and replica_engines(db.engines):
+        mark_primary_sticky()
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def forget_writes(session):
+    session.info.pop('wrote', None)
+
+def replica_engines(engines):
+    return [engine for key, engine in engines.items() if key and key.startswith(REPLICA_BIND_PREFIX)]
+
+def replica_reads(f):
+    """
+    Decorator for read-only logic functions: their SELECTs may run on a replica (when configured)
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if _read_target.get() == 'primary':
+            return f(*args, **kwargs)
+        token = _read_target.set('replica')
+        try:
+            return f(*args, **kwargs)
+        finally:
+            _read_target.reset(token)
+    return decorated_function
+
+@contextlib.contextmanager
+def primary_reads():
+    """
+    Keep the reads of the block on the primary, even inside @replica_reads functions
+    """
+    token = _read_target.set('primary')
+    try:
+        yield
+    finally:
+        _read_target.reset(token)
+
+def request_user_id():
+    """
+    Id of the user making the current request, from the principal of a batch sub-request or the bearer token
+    """
+    # Imported here, auth imports the models which import this module
+    from .auth import PRINCIPAL_ENVIRON_KEY, decode_token
+    principal = request.environ.get(PRINCIPAL_ENVIRON_KEY)
+    if principal is not None:
+        return principal.id
+    token = request.headers.get('Authorization', '')
+    if not token.startswith('Bearer '):
+        return None
+    # Memoized by decode_token, so it doesn't verify the JWT again when the route already did
+    return decode_token(token.split(' ')[1])
+
+def mark_primary_sticky():
+    user_id = request_user_id()
+    if user_id:
+        sticky_users.set(user_id, True)
+    g.primary_sticky = True
+    g.set_sticky_cookie = True
+
+def primary_sticky():
+    """
+    True when the reads of the current request must stay on the primary (its user changed something recently)
+    """
+    if not has_request_context():
+        return False
+    if 'primary_sticky' not in g:
+        until = request.cookies.get(STICKY_COOKIE, '')
+        g.primary_sticky = ((until.isdigit() and int(until) > time.time())
+                            or sticky_users.get(request_user_id()) is not None)
+    return g.primary_sticky
+
+# Summed over the live worker processes (each one writes its own values, see shared/instrumentation.py)
+pool_size_gauge = Gauge('db_pool_size', 'Connections kept by the pool (pool_size), by bind', ['bind'],
+                        multiprocess_mode='livesum')
+pool_checked_out_gauge = Gauge('db_pool_checked_out', 'Connections in use, by bind', ['bind'], multiprocess_mode='livesum')
+pool_overflow_gauge = Gauge('db_pool_overflow', 'Connections open beyond pool_size, by bind', ['bind'],
+                            multiprocess_mode='livesum')
+pool_wait_seconds = Histogram('db_pool_wait_seconds', 'Time waited to get a connection from the pool',
+                              buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0))
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool that records how long requests wait to get a connection (time blocked when the pool is exhausted)
+    and exports its usage on every checkout and checkin. bind names its series ('primary' or the replica bind key)
+    """
+    bind = 'primary'
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            elapsed = time.perf_counter() - start
+            pool_wait_stats.record(elapsed)
+            pool_wait_seconds.observe(elapsed)
+            self.export_usage()
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        self.export_usage()
+
+    def recreate(self):
+        # engine.dispose() replaces the pool
+        pool = super().recreate()
+        pool.bind = self.bind
+        return pool
+
+    def export_usage(self):
+        pool_size_gauge.labels(self.bind).set(self.size())
+        pool_checked_out_gauge.labels(self.bind).set(self.checkedout())
+        pool_overflow_gauge.labels(self.bind).set(max(self.overflow(), 0))
+
+class PoolWaitStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, seconds):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'total_wait_ms': round(self.total_wait * 1000, 3),
+                'avg_wait_ms': round(self.total_wait * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 3)
+            }
+
+pool_wait_stats = PoolWaitStats()
+
+def init_db(app):
+    """
+    Configure the engine options from the app config and bind db to the app. Used by create_app (app/factory.py)
+    """
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI') or ''
+    # SQLite (eg: local runs) uses its own pool classes which don't accept these options
+    options = {}
+    if not uri.startswith('sqlite'):
+        options = {
+            'poolclass': TimedQueuePool,
+            'pool_size': app.config['DB_POOL_SIZE'],
+            'max_overflow': app.config['DB_MAX_OVERFLOW'],
+            'pool_timeout': app.config['DB_POOL_TIMEOUT'],
+            'pool_recycle': app.config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': app.config['DB_POOL_PRE_PING']
+        }
+        options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+    # Replicas are extra binds with the same pool settings (Flask-SQLAlchemy only applies them to the default one)
+    binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+    for index, replica_uri in enumerate(app.config.get('DATABASE_REPLICA_URLS') or []):
+        binds[f'{REPLICA_BIND_PREFIX}{index}'] = dict(options if not replica_uri.startswith('sqlite') else {}, url=replica_uri)
+    db.init_app(app)
+
+    statement_timeout = app.config.get('DB_STATEMENT_TIMEOUT_MS', 0)
+    with app.app_context():
+        engines = dict(db.engines)
+    for key, engine in engines.items():
+        if isinstance(engine.pool, TimedQueuePool):
+            engine.pool.bind = key or 'primary'
+        if statement_timeout and engine.dialect.name == 'mysql':
+            event.listen(engine, 'connect', set_statement_timeout(statement_timeout))
+
+    if app.config.get('DATABASE_REPLICA_URLS'):
+        @app.after_request
+        def set_sticky_cookie(response):
+            if g.get('set_sticky_cookie'):
+                seconds = int(app.config['DB_REPLICA_STICKY_SECONDS'])
+                response.set_cookie(STICKY_COOKIE, str(int(time.time()) + seconds), max_age=seconds,
+                                    httponly=True, samesite='Lax')
+            return response
+
+def set_statement_timeout(statement_timeout):
+    def on_connect(dbapi_connection, connection_record):
+        # MySQL only enforces max_execution_time on SELECT statements
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f'SET SESSION max_execution_time = {int(statement_timeout)}')
+        cursor.close()
+    return on_connect
+
+def get_pool_stats():
+    """
+    Current pool usage of this process' engine. Must be called inside an app context
+    """
+    pool = db.engine.pool
+    stats = {'pool_class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            # overflow() counts from -pool_size, only the positive part are extra connections
+            'overflow': max(pool.overflow(), 0)
+        })
+    stats['wait'] = pool_wait_stats.as_dict()
+    return stats
@@ -0,0 +1,115 @@
+"""
+Outbox of domain events (order.created, product.updated, user.deleted, ...)
+Mutating logic calls emit_event() before its commit: the event is one more row in outbox_events, written in the
+same transaction as the change. So an event exists if and only if its change was committed, and the request only
+pays for one extra INSERT.
+A separate worker process (flask outbox-worker, the outbox-worker service of docker-compose) drains the outbox in
+batches of OUTBOX_BATCH_SIZE: it appends the events to the append-only event_log table, removes them from the outbox
+in the same transaction, and then hands them to the consumers registered with register_consumer (eg: search indexing,
+analytics). Consumers get every event at least once, a failing consumer is logged and can catch up from event_log
+(event ids, its outbox_id column, only go up: outbox ids are never reused).
+Several workers can drain together on MySQL 8 (SELECT ... FOR UPDATE SKIP LOCKED), on SQLite run a single one
+"""
+import json
+import logging
+import signal
+import time
+import click
+from sqlalchemy import delete, select
+from .database import db
+from .models import OutboxEvent, EventLog
+
+_consumers = []
+
+def emit_event(event_type, aggregate_type, aggregate_id, payload=None):
+    """
+    Add an event to the current transaction, it's only stored if the caller commits
+    """
+    db.session.add(OutboxEvent(event_type=event_type, aggregate_type=aggregate_type, aggregate_id=aggregate_id,
+                               payload=json.dumps(payload or {}, default=str)))
+
+def register_consumer(prefix=''):
+    """
+    Decorator for a function receiving every drained event (dict) whose type starts with prefix (eg: 'product.')
+    """
+    def decorator(f):
+        _consumers.append((prefix, f))
+        return f
+    return decorator
+
+def event_to_dict(event):
+    return {
+        'id': event.id,
+        'type': event.event_type,
+        'aggregate_type': event.aggregate_type,
+        'aggregate_id': event.aggregate_id,
+        'payload': json.loads(event.payload),
+        'created_at': event.created_at.isoformat() if event.created_at else None
+    }
+
+def drain_outbox(batch_size):
+    """
+    Move up to batch_size events from the outbox to the event log, then dispatch them. Returns the number moved
+    """
+    events = (OutboxEvent.query.order_by(OutboxEvent.id).limit(batch_size)
+              .with_for_update(skip_locked=True).all())
+    if not events:
+        db.session.rollback()
+        return 0
+    # Events already logged (eg: a batch whose outbox DELETE didn't commit) are only removed from the outbox
+    logged = set(db.session.scalars(
+        select(EventLog.outbox_id).where(EventLog.outbox_id.in_([event.id for event in events]))))
+    new_events = [event for event in events if event.id not in logged]
+    if new_events:
+        db.session.execute(EventLog.__table__.insert(), [{
+            'outbox_id': event.id,
+            'event_type': event.event_type,
+            'aggregate_type': event.aggregate_type,
+            'aggregate_id': event.aggregate_id,
+            'payload': event.payload,
+            'created_at': event.created_at
+        } for event in new_events])
+    db.session.execute(delete(OutboxEvent).where(OutboxEvent.id.in_([event.id for event in events])))
+    drained = [event_to_dict(event) for event in new_events]
+    db.session.commit()
+    dispatch(drained)
+    return len(events)
+
+def dispatch(events):
+    for prefix, consumer in _consumers:
+        for event in events:
+            if not event['type'].startswith(prefix):
+                continue
+            try:
+                consumer(event)
+            except Exception as e:
+                logging.error(f"Event consumer {consumer.__name__} failed on event {event['id']}: {e}")
+
+def run_outbox_worker(batch_size, poll_interval, once=False):
+    """
+    Drain until the outbox is empty, then poll every poll_interval seconds. Stops after the current batch on SIGTERM
+    """
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+    total = 0
+    while not stopping:
+        try:
+            drained = drain_outbox(batch_size)
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Error draining the outbox: {e}")
+            drained = 0
+        total += drained
+        if drained < batch_size:
+            if once:
+                break
+            time.sleep(poll_interval)
+    return total
+
+def register_event_commands(app):
+    @app.cli.command('outbox-worker')
+    @click.option('--once', is_flag=True, help='Exit when the outbox is empty instead of polling')
+    def outbox_worker_command(once):
+        """Drain the event outbox into the event log."""
+        total = run_outbox_worker(app.config['OUTBOX_BATCH_SIZE'], app.config['OUTBOX_POLL_INTERVAL'], once=once)
+        click.echo(f'Drained {total} events')
@@ -0,0 +1,175 @@
+"""
+Request level performance instrumentation shared by the customer and admin backends
+Per request it measures:
+- total latency (histogram per route, method and status)
+- SQL statements: count and time, from SQLAlchemy engine events
+- JSON serialization time (the app's JSON provider)
+- authentication overhead of token_required (record_timing('auth', ...))
+- response compression time (see shared/compression.py)
+The per request numbers are sent back in a Server-Timing header (visible in the browser dev tools) and the
+aggregates are exposed in Prometheus text format on GET /metrics, for the addresses of METRICS_ALLOWED_NETWORKS only.
+With several gunicorn workers, set PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py does): every worker writes its metrics
+there and a scrape served by any worker sums them all (prometheus_client multiprocess mode)
+Statements slower than SLOW_QUERY_THRESHOLD_MS are logged, and a request running the same statement
+N_PLUS_ONE_THRESHOLD times or more (a query in a loop, eg: lazy loading a relationship per row) is logged as N+1
+"""
+import ipaddress
+import logging
+import os
+import time
+from collections import Counter
+from flask import Response, g, has_request_context, jsonify, request
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest, multiprocess
+from prometheus_client import Counter as PrometheusCounter, Histogram
+from sqlalchemy import event
+from .database import db
+from .serialization import FastJSONProvider
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+request_duration = Histogram('http_request_duration_seconds', 'Request latency by route', ['method', 'route', 'status'],
+                             buckets=LATENCY_BUCKETS)
+db_statements = PrometheusCounter('db_statements_total', 'SQL statements executed, by route', ['route'])
+slow_queries = PrometheusCounter('slow_queries_total', 'SQL statements slower than SLOW_QUERY_THRESHOLD_MS, by route',
+                                 ['route'])
+n_plus_one = PrometheusCounter('n_plus_one_total',
+                               'Requests repeating the same SQL statement N_PLUS_ONE_THRESHOLD times or more, by route',
+                               ['route'])
+
+# Request phases recorded with record_timing -> counter of their total time
+TIMING_METRICS = {
+    'db': PrometheusCounter('db_statement_seconds_total', 'Time spent in SQL statements, by route', ['route']),
+    'serialize': PrometheusCounter('json_serialization_seconds_total', 'Time spent serializing JSON responses, by route',
+                                   ['route']),
+    'auth': PrometheusCounter('auth_seconds_total', 'Time spent authenticating requests (token_required), by route',
+                              ['route']),
+    'compress': PrometheusCounter('compression_seconds_total', 'Time spent compressing response bodies, by route',
+                                  ['route'])
+}
+
+def record_timing(name, seconds):
+    """
+    Add time to a named phase of the current request (shows up in Server-Timing and as <name>_seconds_total)
+    No-op outside of a request
+    """
+    if has_request_context() and 'timings' in g:
+        g.timings[name] = g.timings.get(name, 0.0) + seconds
+
+class TimedJSONProvider(FastJSONProvider):
+    """
+    JSON provider recording the serialization time of jsonify() and friends
+    """
+    def dumps(self, obj, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            record_timing('serialize', time.perf_counter() - start)
+
+    def dumps_bytes(self, obj, indent=False):
+        start = time.perf_counter()
+        try:
+            return super().dumps_bytes(obj, indent)
+        finally:
+            record_timing('serialize', time.perf_counter() - start)
+
+def route_label():
+    # URL rule instead of the path, so /orders/1 and /orders/2 are one series
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+def init_instrumentation(app):
+    """
+    Hook the instrumentation into an app (see create_app in app/factory.py). Must be called after init_db
+    """
+    if not app.config.get('INSTRUMENTATION_ENABLED', True):
+        return
+    app.json = TimedJSONProvider(app)
+    slow_query_seconds = app.config.get('SLOW_QUERY_THRESHOLD_MS', 200) / 1000
+    n_plus_one_threshold = app.config.get('N_PLUS_ONE_THRESHOLD', 10)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+        g.timings = {}
+        g.sql_count = 0
+        g.sql_statements = Counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        if 'request_start' not in g:
+            return response
+        elapsed = time.perf_counter() - g.request_start
+        route = route_label()
+        request_duration.labels(request.method, route, str(response.status_code)).observe(elapsed)
+        db_statements.labels(route).inc(g.sql_count)
+        for name, seconds in g.timings.items():
+            if name in TIMING_METRICS:
+                TIMING_METRICS[name].labels(route).inc(seconds)
+        repeated = [(statement, count) for statement, count in g.sql_statements.items() if count >= n_plus_one_threshold]
+        if repeated:
+            n_plus_one.labels(route).inc()
+            for statement, count in repeated:
+                logger.warning('Possible N+1 in %s %s: statement ran %d times: %s', request.method, route, count, statement)
+        if app.config.get('SERVER_TIMING_ENABLED', True):
+            entries = [f'db;dur={g.timings.get("db", 0.0) * 1000:.2f};desc="{g.sql_count} queries"']
+            entries += [f'{name};dur={seconds * 1000:.2f}' for name, seconds in g.timings.items() if name != 'db']
+            entries.append(f'total;dur={elapsed * 1000:.2f}')
+            response.headers['Server-Timing'] = ', '.join(entries)
+        return response
+
+    def start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('statement_start', []).append(time.perf_counter())
+
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['statement_start'].pop()
+        in_request = has_request_context() and 'timings' in g
+        if elapsed >= slow_query_seconds:
+            route = route_label() if in_request else None
+            slow_queries.labels(route or 'none').inc()
+            logger.warning('Slow query (%.1f ms) in %s: %s', elapsed * 1000, route or 'no request', statement)
+        if in_request:
+            g.sql_count += 1
+            # Statements are parametrized, so the same text means the same query shape with other values
+            g.sql_statements[statement] += 1
+            record_timing('db', elapsed)
+
+    # Primary and read replicas
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', start_statement_timer)
+        event.listen(engine, 'after_cursor_execute', record_statement)
+
+    if app.config.get('METRICS_ENABLED', True):
+        allowed_networks = parse_networks(app.config.get('METRICS_ALLOWED_NETWORKS', ''))
+
+        @app.route('/metrics')
+        def prometheus_metrics():
+            if not address_allowed(request.remote_addr, allowed_networks):
+                return jsonify({'message': 'Forbidden'}), 403
+            return Response(generate_latest(metrics_registry()), mimetype=CONTENT_TYPE_LATEST)
+
+def parse_networks(value):
+    """
+    Comma separated addresses or networks (eg: 127.0.0.1,10.0.0.0/8) -> list of ip_network
+    """
+    return [ipaddress.ip_network(item.strip(), strict=False) for item in value.split(',') if item.strip()]
+
+def address_allowed(address, networks):
+    try:
+        address = ipaddress.ip_address(address or '')
+    except ValueError:
+        return False
+    return any(address in network for network in networks)
+
+def metrics_registry():
+    """
+    Registry of a scrape: the metrics of every worker in multiprocess mode, else the ones of this process
+    """
+    if not os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
@@ -1,10 +1,14 @@
-from ..customer import db
-# from app import db
-from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import Table, Column, Integer, String, Text, Float, ForeignKey, Boolean, DateTime
-from sqlalchemy.orm import relationship
+from .database import db
+from .passwords import hash_password, verify_password, needs_rehash
+from sqlalchemy import Table, Column, Integer, String, Text, Float, ForeignKey, Boolean, Date, DateTime, Index, UniqueConstraint
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 
+# Indexes: Every one matches a hot query of the management logic (see HOT_QUERIES in shared/query_plan.py,
+# which checks with EXPLAIN that none of them does a full scan). users.username/email are already indexed by
+# their unique constraints. InnoDB appends the primary key to every secondary index, so (col) also serves
+# ORDER BY col, id keyset pagination
+
 # vsCode Copilot explanation after research: The red cross in PROBLEMS windows means Linter treats it as an error,
 # but it isn't a Python runtime error. Your Flask app should work as expected if you run it normally.
 # The error is safe to ignore using # type: ignore
@@ -17,12 +21,18 @@ class User(db.Model): # type: ignore
     is_admin = Column(Boolean, default=False)
     stores = relationship('Store', backref='owner', lazy=True)
     orders = relationship('Order', backref='user', lazy=True)
+    __table_args__ = (
+        Index('ix_users_is_admin', 'is_admin'),  # admin user listing filtered by is_admin
+    )
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password) # type: ignore
+        return verify_password(self.password_hash, password) # type: ignore
+
+    def password_needs_rehash(self):
+        return needs_rehash(self.password_hash)
 
     def __repr__(self):
         return f'<User {self.username}>'
@@ -34,6 +44,10 @@ class Store(db.Model): # type: ignore
     description = Column(Text)
     owner_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     products = relationship('Product', backref='store', lazy=True)
+    __table_args__ = (
+        Index('ix_stores_owner_id', 'owner_id'),  # stores of an owner
+        Index('ix_stores_name', 'name'),  # name prefix filter and sort=name
+    )
 
     def __repr__(self):
         return f'<Store {self.name}>'
@@ -44,9 +58,21 @@ class Product(db.Model):
     name = Column(String(255), nullable=False)
     description = Column(Text)
     price = Column(Float, nullable=False)
-    # Issue: product_stock is missing here
+    # Units available. NULL means stock isn't tracked for the product (never out of stock)
+    stock = Column(Integer)
     store_id = Column(Integer, ForeignKey('stores.id'), nullable=False)
+    # Store's own product code. Optional, but it's the key used by the bulk import to update existing products
+    sku = Column(String(64))
     order_items = relationship('OrderItem', backref='product', lazy=True)
+    __table_args__ = (
+        UniqueConstraint('store_id', 'sku', name='uq_products_store_id_sku'),
+        Index('ix_products_store_id_price', 'store_id', 'price'),  # store catalog, price range and sort=price
+        Index('ix_products_store_id_name', 'store_id', 'name'),  # store catalog with name prefix and sort=name
+        Index('ix_products_price', 'price'),  # whole catalog price range and sort=price
+        Index('ix_products_name', 'name'),  # whole catalog name prefix and sort=name
+        # Full-text search (GET /products/search). MySQL only, other databases use a LIKE fallback
+        Index('ix_products_fulltext', 'name', 'description', mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+    )
 
     def __repr__(self):
         return f'<Product {self.name}>'
@@ -58,7 +84,11 @@ class Order(db.Model):
     order_date = Column(DateTime, server_default=func.now())
     #Issue: order_status is missing here
     total_amount = Column(Float, nullable=False)
-    items = relationship('OrderItem', backref='order', lazy=True)
+    # Items belong to their order: deleting an order deletes its items
+    items = relationship('OrderItem', backref='order', lazy=True, cascade='all, delete-orphan')
+    __table_args__ = (
+        Index('ix_orders_user_id', 'user_id'),  # orders of the current user
+    )
 
     def __repr__(self):
         return f'<Order {self.id}>'
@@ -69,6 +99,96 @@ class OrderItem(db.Model):
     order_id = Column(Integer, ForeignKey('orders.id'), nullable=False)
     product_id = Column(Integer, ForeignKey('products.id'), nullable=False)
     quantity = Column(Integer, nullable=False)
+    # Snapshot of the product at checkout: the price paid and the store credited, whatever the product becomes later.
+    # Deferred so loading the items of a page of orders still only reads the covering index below
+    unit_price = deferred(Column(Float, nullable=False))
+    store_id = deferred(Column(Integer, nullable=False))
+    __table_args__ = (
+        # Covering index for loading the items of a page of orders (WHERE order_id IN (...)) without table lookups
+        Index('ix_order_items_order_id_product_id_quantity', 'order_id', 'product_id', 'quantity'),
+        Index('ix_order_items_product_id', 'product_id'),  # orders containing a product
+    )
 
     def __repr__(self):
-        return f'<OrderItem {self.quantity} of {self.product_id}>'
\ No newline at end of file
+        return f'<OrderItem {self.quantity} of {self.product_id}>'
+
+# Checkouts accepted by POST /api/orders (see create_order_logic). Pending requests are turned into orders by the
+# order worker (customer/order_queue.py). (user_id, idempotency_key) is unique, so a retried checkout sending the
+# same Idempotency-Key gets the first request back instead of creating a second order
+class OrderRequest(db.Model):
+    __tablename__ = 'order_requests'
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    idempotency_key = Column(String(255))
+    request_hash = Column(String(64), nullable=False)  # sha256 of the items, a reused key must send the same ones
+    items = Column(Text, nullable=False)  # JSON
+    status = Column(String(16), nullable=False, default='pending')  # pending, completed or failed
+    order_id = Column(Integer, ForeignKey('orders.id', ondelete='SET NULL'))
+    # Response of the processed request (JSON body and HTTP status), returned again to retries
+    result = Column(Text)
+    result_status = Column(Integer)
+    created_at = Column(DateTime, server_default=func.now())
+    processed_at = Column(DateTime)
+    __table_args__ = (
+        UniqueConstraint('user_id', 'idempotency_key', name='uq_order_requests_user_id_idempotency_key'),
+        Index('ix_order_requests_status', 'status', 'id'),  # oldest pending requests, polled by the workers
+    )
+
+# Sales rollups for the admin analytics (see shared/analytics.py). They are kept up to date incrementally by
+# create_order_logic/delete_order_logic, so dashboard queries read a few pre-aggregated rows instead of scanning
+# orders and order_items. period is 'day' or 'week' (period_start is the Monday of the week)
+class StoreSalesRollup(db.Model):
+    __tablename__ = 'store_sales_rollups'
+    period = Column(String(8), primary_key=True)
+    period_start = Column(Date, primary_key=True)
+    store_id = Column(Integer, ForeignKey('stores.id'), primary_key=True)
+    orders = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+    __table_args__ = (
+        Index('ix_store_sales_rollups_store_id_period', 'store_id', 'period', 'period_start'),  # history of a store
+    )
+
+class ProductSalesRollup(db.Model):
+    __tablename__ = 'product_sales_rollups'
+    period = Column(String(8), primary_key=True)
+    period_start = Column(Date, primary_key=True)
+    product_id = Column(Integer, ForeignKey('products.id'), primary_key=True)
+    store_id = Column(Integer, ForeignKey('stores.id'), nullable=False)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+    __table_args__ = (
+        # Top products of a period (optionally of a store) read in revenue order straight from the index
+        Index('ix_product_sales_rollups_period_revenue', 'period', 'period_start', 'revenue'),
+        Index('ix_product_sales_rollups_store_period_revenue', 'store_id', 'period', 'period_start', 'revenue'),
+    )
+
+# Domain events (see shared/events.py). outbox_events only holds the events not drained yet, so it stays small.
+# event_log is append-only: rows are inserted by the outbox worker and never updated. Its rows get their own id,
+# outbox_id (unique) is the id the event had in the outbox, which is the event id consumers see
+class OutboxEvent(db.Model):
+    __tablename__ = 'outbox_events'
+    id = Column(Integer, primary_key=True)
+    event_type = Column(String(64), nullable=False)
+    aggregate_type = Column(String(32), nullable=False)
+    aggregate_id = Column(Integer)
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+    # The outbox is emptied by every drain: without AUTOINCREMENT, SQLite would hand out the drained ids again
+    __table_args__ = {'sqlite_autoincrement': True}
+
+class EventLog(db.Model):
+    __tablename__ = 'event_log'
+    id = Column(Integer, primary_key=True)
+    outbox_id = Column(Integer, nullable=False)
+    event_type = Column(String(64), nullable=False)
+    aggregate_type = Column(String(32), nullable=False)
+    aggregate_id = Column(Integer)
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime)
+    recorded_at = Column(DateTime, server_default=func.now())
+    __table_args__ = (
+        Index('ix_event_log_aggregate', 'aggregate_type', 'aggregate_id'),  # history of one order/product/...
+        Index('ix_event_log_event_type', 'event_type', 'id'),  # consumers catching up on a type of event
+        UniqueConstraint('outbox_id', name='uq_event_log_outbox_id'),  # an event is logged once
+    )
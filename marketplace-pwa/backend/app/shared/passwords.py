@@ -0,0 +1,68 @@
+"""
+Password hashing off the request workers
+PBKDF2/scrypt are CPU bound by design, so a burst of logins/registrations would pin every request worker
+and starve the rest of the traffic (catalog browsing). Hashes are computed in a small dedicated process
+pool instead. The pool is bounded: when PASSWORD_HASH_MAX_PENDING hashes are already queued or running,
+new requests wait up to PASSWORD_HASH_QUEUE_TIMEOUT seconds and then fail fast with PasswordHasherBusy
+(the routes answer 503) instead of piling up.
+PASSWORD_HASH_WORKERS=0 hashes inline (eg: local development)
+"""
+import functools
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+from .config import Config
+
+class PasswordHasherBusy(Exception):
+    """
+    Raised when the hashing pool is saturated
+    """
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(max(Config.PASSWORD_HASH_MAX_PENDING, 1))
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # spawn instead of fork: forking a multi-threaded server process is unsafe
+                _executor = ProcessPoolExecutor(max_workers=Config.PASSWORD_HASH_WORKERS,
+                                                mp_context=multiprocessing.get_context('spawn'))
+    return _executor
+
+def _run(func, *args):
+    if Config.PASSWORD_HASH_WORKERS <= 0:
+        return func(*args)
+    if not _pending.acquire(timeout=Config.PASSWORD_HASH_QUEUE_TIMEOUT):
+        raise PasswordHasherBusy('Password hashing pool is saturated')
+    try:
+        return _get_executor().submit(func, *args).result()
+    finally:
+        _pending.release()
+
+def _generate_hash(password, method):
+    # werkzeug's own default when no method is configured
+    return generate_password_hash(password, method) if method else generate_password_hash(password)
+
+def hash_password(password):
+    return _run(_generate_hash, password, Config.PASSWORD_HASH_METHOD)
+
+def verify_password(password_hash, password):
+    return _run(check_password_hash, password_hash, password)
+
+@functools.lru_cache(maxsize=None)
+def hash_prefix(method):
+    """
+    Method and cost as werkzeug writes them in front of the hash (eg: 'scrypt' -> 'scrypt:32768:8:1'), so short
+    forms of the configured method match the hashes they produce
+    """
+    return _generate_hash('', method).split('$', 1)[0]
+
+def needs_rehash(password_hash):
+    """
+    True if the hash was made with other method/cost than the configured one (eg: PASSWORD_HASH_METHOD changed)
+    """
+    return password_hash.split('$', 1)[0] != hash_prefix(Config.PASSWORD_HASH_METHOD)
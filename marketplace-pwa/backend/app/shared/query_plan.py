@@ -0,0 +1,89 @@
+"""
+Query plan check for the hot queries of the management logic
+Runs EXPLAIN on every query in HOT_QUERIES against the configured database and fails (exit code 1) if any of
+them does a full table or full index scan. Run it against a seeded database (MySQL may prefer a full scan
+on nearly empty tables), eg: after a migration that touches indexes:
+    flask --app app.customer.wsgi check-query-plans
+Scans listed in EXPECTED_FULL_SCANS for the current dialect are reported but don't fail the check
+"""
+import sys
+import click
+from sqlalchemy import or_, select
+from .database import db
+from .models import User, Store, Product, Order, OrderItem, OrderRequest
+
+# (name, statement) pairs mirroring the queries issued by customer_management.py / admin_management.py
+HOT_QUERIES = [
+    ('login: user by username', lambda: select(User).where(User.username == 'username')),
+    ('registration: user by email', lambda: select(User).where(User.email == 'user@example.com')),
+    ('orders of a user', lambda: select(Order).where(Order.user_id == 1).order_by(Order.id)),
+    ('items of a page of orders', lambda: select(OrderItem.order_id, OrderItem.product_id, OrderItem.quantity)
+        .where(OrderItem.order_id.in_([1, 2, 3]))),
+    ('order items of a product', lambda: select(OrderItem).where(OrderItem.product_id == 1)),
+    ('stores of an owner', lambda: select(Store).where(Store.owner_id == 1).order_by(Store.id).limit(51)),
+    ('store catalog page by price', lambda: select(Product).where(Product.store_id == 1, Product.price >= 10)
+        .order_by(Product.price, Product.id).limit(51)),
+    ('store catalog page by name', lambda: select(Product).where(Product.store_id == 1)
+        .order_by(Product.name, Product.id).limit(51)),
+    ('catalog price range', lambda: select(Product).where(Product.price.between(10, 20))
+        .order_by(Product.price, Product.id).limit(51)),
+    ('admin users page', lambda: select(User.id, User.username, User.email, User.is_admin)
+        .where(User.id > 1).order_by(User.id).limit(51)),
+    ('admin users filtered by is_admin', lambda: select(User.id, User.username, User.email, User.is_admin)
+        .where(User.is_admin == True).order_by(User.id).limit(51)),
+    ('admin users search', lambda: select(User.id, User.username, User.email, User.is_admin)
+        .where(or_(User.username.startswith('abc', autoescape=True), User.email.startswith('abc', autoescape=True)))
+        .order_by(User.id).limit(51)),
+    ('admin users search by username', lambda: select(User.id, User.username, User.email, User.is_admin)
+        .where(or_(User.username.startswith('abc', autoescape=True), User.email.startswith('abc', autoescape=True)))
+        .order_by(User.username, User.id).limit(51)),
+    ('cart products by id', lambda: select(Product.id, Product.price).where(Product.id.in_([1, 2, 3]))),
+    ('order request by idempotency key', lambda: select(OrderRequest)
+        .where(OrderRequest.user_id == 1, OrderRequest.idempotency_key == 'key')),
+    ('order worker: oldest pending requests', lambda: select(OrderRequest).where(OrderRequest.status == 'pending')
+        .order_by(OrderRequest.id).limit(50)),
+]
+
+SQLITE_LIKE_SCAN = "SQLite's LIKE is case-insensitive, so it can't use the (case-sensitive) indexes"
+# (dialect, query name) -> why a full scan is the best that dialect can do
+EXPECTED_FULL_SCANS = {
+    ('sqlite', 'admin users search'): SQLITE_LIKE_SCAN,
+    ('sqlite', 'admin users search by username'): SQLITE_LIKE_SCAN,
+}
+
+def explain(statement):
+    """
+    Returns (full_scan, plan lines) for a statement on the current engine (MySQL or SQLite)
+    """
+    dialect = db.engine.dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+    with db.engine.connect() as connection:
+        if dialect.name == 'sqlite':
+            rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}').mappings().all()
+            plan = [row['detail'] for row in rows]
+            # 'SCAN table' is a full scan, 'SEARCH table USING INDEX ...' is an index lookup/range
+            full_scan = any(line.startswith('SCAN ') for line in plan)
+        else:
+            rows = connection.exec_driver_sql(f'EXPLAIN {sql}').mappings().all()
+            plan = [f"{row['table']}: type={row['type']} key={row['key']} rows={row['rows']}" for row in rows]
+            # type ALL is a full table scan, type index a full index scan
+            full_scan = any(row['type'] in ('ALL', 'index') for row in rows)
+    return full_scan, plan
+
+def register_query_plan_command(app):
+    @app.cli.command('check-query-plans')
+    def check_query_plans():
+        """Fail if any hot query does a full scan."""
+        failures = 0
+        dialect = db.engine.dialect.name
+        for name, build_statement in HOT_QUERIES:
+            full_scan, plan = explain(build_statement())
+            expected = EXPECTED_FULL_SCANS.get((dialect, name))
+            if full_scan and expected:
+                click.echo(f"{'expected':9} {name}: {' | '.join(plan)} ({expected})")
+                continue
+            failures += full_scan
+            click.echo(f"{'FULL SCAN' if full_scan else 'ok':9} {name}: {' | '.join(plan)}")
+        if failures:
+            click.echo(f'{failures} hot queries do a full scan')
+            sys.exit(1)
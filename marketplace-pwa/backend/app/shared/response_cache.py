@@ -0,0 +1,130 @@
+"""
+Response cache for the public, read-heavy catalog GETs (stores and products)
+Cached entries hold the serialized JSON body and a strong ETag (hash of the body), so repeated hits skip
+the ORM and the serialization, and clients sending If-None-Match get a bodyless 304 when nothing changed.
+Entries are grouped by namespace ('stores', 'products'). Every namespace has a generation number that
+is part of the key: invalidating a namespace just bumps its generation, old entries are never read again
+and age out by TTL/LRU.
+With read replicas, an entry filled from a replica that hasn't caught up with the change that invalidated its
+namespace would serve that stale data for RESPONSE_CACHE_TTL, so fills within DB_REPLICA_STICKY_SECONDS of an
+invalidation read from the primary.
+Backends:
+- MemoryCacheBackend (default): per process. Invalidations don't reach the other workers, which keep serving their
+  entries until RESPONSE_CACHE_TTL expires (5 seconds by default without RESPONSE_CACHE_URL)
+- RedisCacheBackend (RESPONSE_CACHE_URL=redis://...): shared by every worker of the customer and admin backends
+"""
+import contextlib
+import hashlib
+import threading
+import time
+from functools import wraps  # for creating decorators
+from flask import current_app, request
+from .cache import TTLCache
+from .config import Config
+from .database import primary_reads
+from .utils import wants_ndjson
+
+class MemoryCacheBackend:
+    def __init__(self, maxsize, ttl):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._generations = {}
+        self._invalidated_at = {}
+        self._lock = threading.Lock()
+
+    def get_generation(self, namespace):
+        return self._generations.get(namespace, 0)
+
+    def bump_generation(self, namespace):
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            self._invalidated_at[namespace] = time.time()
+
+    def last_invalidated(self, namespace):
+        return self._invalidated_at.get(namespace, 0.0)
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def set(self, key, body, etag, ttl):
+        self._entries.set(key, (body, etag), ttl=ttl)
+
+class RedisCacheBackend:
+    def __init__(self, url):
+        # Optional dependency, only needed when a shared cache is configured
+        import redis
+        self._client = redis.Redis.from_url(url)
+
+    def get_generation(self, namespace):
+        return int(self._client.get(f'response-cache:gen:{namespace}') or 0)
+
+    def bump_generation(self, namespace):
+        pipeline = self._client.pipeline()
+        pipeline.incr(f'response-cache:gen:{namespace}')
+        pipeline.set(f'response-cache:invalidated:{namespace}', time.time())
+        pipeline.execute()
+
+    def last_invalidated(self, namespace):
+        return float(self._client.get(f'response-cache:invalidated:{namespace}') or 0)
+
+    def get(self, key):
+        value = self._client.get(f'response-cache:{key}')
+        if value is None:
+            return None
+        etag, body = value.split(b'\n', 1)
+        return body, etag.decode('ascii')
+
+    def set(self, key, body, etag, ttl):
+        self._client.set(f'response-cache:{key}', etag.encode('ascii') + b'\n' + body, ex=ttl)
+
+def create_cache_backend(url, maxsize, ttl):
+    if url:
+        return RedisCacheBackend(url)
+    return MemoryCacheBackend(maxsize, ttl)
+
+response_cache = create_cache_backend(Config.RESPONSE_CACHE_URL, Config.RESPONSE_CACHE_SIZE, Config.RESPONSE_CACHE_TTL)
+
+def invalidate_responses(*namespaces):
+    """
+    Must be called after committing a change to the data cached under these namespaces
+    """
+    for namespace in namespaces:
+        response_cache.bump_generation(namespace)
+
+def recently_invalidated(namespace):
+    """
+    True when replicas may still miss the change that last invalidated this namespace
+    """
+    if not current_app.config.get('DATABASE_REPLICA_URLS'):
+        return False
+    return time.time() - response_cache.last_invalidated(namespace) < current_app.config['DB_REPLICA_STICKY_SECONDS']
+
+def cached_response(namespace):
+    """
+    Decorator for GET routes returning (json, status). Only 200 responses are cached, errors always run the route.
+    Streamed (NDJSON) responses are never cached
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            ttl = current_app.config.get('RESPONSE_CACHE_TTL', 0)
+            if ttl <= 0 or wants_ndjson():
+                return f(*args, **kwargs)
+            key = f'{namespace}:{response_cache.get_generation(namespace)}:{request.full_path}'
+            entry = response_cache.get(key)
+            if entry is None:
+                with primary_reads() if recently_invalidated(namespace) else contextlib.nullcontext():
+                    response = current_app.make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                body = response.get_data()
+                etag = hashlib.sha256(body).hexdigest()
+                response_cache.set(key, body, etag, ttl)
+            else:
+                body, etag = entry
+            response = current_app.response_class(body, mimetype='application/json')
+            response.set_etag(etag)
+            # Clients may keep the response but must revalidate it (cheap 304) before using it
+            response.headers['Cache-Control'] = 'public, no-cache'
+            return response.make_conditional(request)
+        return decorated_function
+    return decorator
@@ -0,0 +1,89 @@
+"""
+JSON provider of both backends (app.json, used by jsonify, the NDJSON streams and request.get_json)
+JSON_SERIALIZER picks the encoder:
+- 'orjson': orjson (optional dependency), several times faster than the json module on our list responses,
+  writes UTF-8 bytes straight into the response body
+- 'json': the standard json module
+- 'auto' (default): orjson when installed, json otherwise
+Both encoders give the same output for our data: compact, non-ASCII characters as UTF-8, keys in insertion
+order (no sorting), datetimes/dates in ISO 8601 (2024-05-01T10:30:00, Flask's own provider uses the HTTP date
+format) and Decimal as a number
+"""
+import dataclasses
+import datetime
+import decimal
+import uuid
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+SERIALIZERS = ('auto', 'orjson', 'json')
+
+def json_default(o):
+    """
+    Types the encoders don't know natively (orjson already handles datetime, date, UUID and dataclasses)
+    """
+    if isinstance(o, (datetime.datetime, datetime.date)):
+        return o.isoformat()
+    if isinstance(o, decimal.Decimal):
+        return float(o)
+    if isinstance(o, uuid.UUID):
+        return str(o)
+    if dataclasses.is_dataclass(o):
+        return dataclasses.asdict(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+def resolve_serializer(name):
+    if name not in SERIALIZERS:
+        raise ValueError(f"JSON_SERIALIZER must be one of: {', '.join(SERIALIZERS)}")
+    if name == 'orjson' and orjson is None:
+        raise RuntimeError('JSON_SERIALIZER is orjson but the orjson package is not installed')
+    if name == 'auto':
+        return 'orjson' if orjson is not None else 'json'
+    return name
+
+def _orjson_dumps(obj, indent):
+    # Non string keys (eg: ints) are turned into strings like the json module does
+    option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+    return orjson.dumps(obj, default=json_default, option=option)
+
+class FastJSONProvider(DefaultJSONProvider):
+    default = staticmethod(json_default)
+    ensure_ascii = False
+    sort_keys = False
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.serializer = resolve_serializer(app.config.get('JSON_SERIALIZER', 'auto'))
+
+    def dumps_bytes(self, obj, indent=False):
+        """
+        Serialize to UTF-8 bytes, compact unless indent
+        """
+        if self.serializer == 'orjson':
+            return _orjson_dumps(obj, indent)
+        dump_args = {'indent': 2} if indent else {'separators': (',', ':')}
+        return DefaultJSONProvider.dumps(self, obj, **dump_args).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        # orjson has no equivalent for the other json.dumps arguments (cls, allow_nan, ...)
+        if self.serializer == 'orjson' and set(kwargs) <= {'indent', 'separators'}:
+            return _orjson_dumps(obj, bool(kwargs.get('indent'))).decode('utf-8')
+        if not kwargs.get('indent'):
+            kwargs.setdefault('separators', (',', ':'))
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.serializer == 'orjson' and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.dumps_bytes(obj, indent) + b'\n', mimetype=self.mimetype)
@@ -1 +1,280 @@
-# Empty till now, but can be used for utility functions in the future
+import base64
+import csv
+import functools
+import io
+import json
+import re
+import threading
+from flask import Response, current_app, has_request_context, jsonify, request, stream_with_context
+from sqlalchemy import and_, or_, text
+
+# Keyset (cursor) pagination helpers shared by the list endpoints.
+# Instead of OFFSET (which makes the DB walk and discard every skipped row), each page
+# continues right after the last row of the previous one: WHERE (sort_col, id) > (last_sort, last_id).
+# With an index on (sort_col, id) every page is a single index range scan, no matter how deep.
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def encode_cursor(values):
+    """
+    Encode the keyset values of the last row of a page into an opaque URL-safe token
+    """
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token, columns):
+    """
+    Decode a cursor token holding one keyset value per column. Returns the list of values or None if the token is
+    invalid, including values that don't match their column's type (they would only fail when bound, as a 500)
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != len(columns):
+        return None
+    if not all(is_cursor_value(value, column) for value, column in zip(values, columns)):
+        return None
+    return values
+
+def keyset_columns(sort_column, id_column):
+    """
+    Columns of the cursor of a listing sorted by sort_column (the id alone, or the sort column then the id)
+    """
+    return [id_column] if sort_column is id_column else [sort_column, id_column]
+
+def is_cursor_value(value, column):
+    # bool is an int subclass, but never a keyset value
+    if isinstance(value, bool):
+        return False
+    python_type = column.type.python_type
+    if python_type is int:
+        return isinstance(value, int)
+    if python_type is str:
+        return isinstance(value, str)
+    # float columns, and computed ones without a type (eg: MySQL MATCH relevance) are numbers
+    return isinstance(value, (int, float))
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """
+    Parse the 'limit' query parameter. Returns None if it isn't a positive integer
+    """
+    if value is None or value == '':
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return None
+    if limit <= 0:
+        return None
+    return min(limit, maximum)
+
+def parse_sort(value, allowed, default='id'):
+    """
+    Parse a 'sort' query parameter like 'price' or '-price' (descending).
+    Returns (column, descending) or None if the field isn't in the allowed dict
+    """
+    value = value or default
+    descending = value.startswith('-')
+    field = value[1:] if descending else value
+    if field not in allowed:
+        return None
+    return allowed[field], descending
+
+def parse_ids(value, maximum=MAX_PAGE_SIZE):
+    """
+    Parse a multi-get 'ids' query parameter like '3,1,2'. Returns the ids without duplicates (in the given order)
+    or None if it isn't a list of 1 to 'maximum' integers
+    """
+    try:
+        ids = list(dict.fromkeys(int(part) for part in value.split(',') if part.strip()))
+    except (AttributeError, ValueError):
+        return None
+    if not ids or len(ids) > maximum:
+        return None
+    return ids
+
+def keyset_page(query, sort_column, id_column, cursor_values, limit, descending=False):
+    """
+    Fetch one page of a query ordered by (sort_column, id_column) starting right after cursor_values.
+    Returns (rows, next_cursor) where next_cursor is None on the last page
+    """
+    same_column = sort_column is id_column
+    if cursor_values:
+        if same_column:
+            last_id = cursor_values[0]
+            query = query.filter(id_column < last_id if descending else id_column > last_id)
+        else:
+            last_sort, last_id = cursor_values[0], cursor_values[1]
+            # Expanded form of the row comparison, as MySQL only uses the index reliably this way
+            if descending:
+                query = query.filter(or_(sort_column < last_sort, and_(sort_column == last_sort, id_column < last_id)))
+            else:
+                query = query.filter(or_(sort_column > last_sort, and_(sort_column == last_sort, id_column > last_id)))
+    if same_column:
+        order = [id_column.desc() if descending else id_column.asc()]
+    else:
+        order = [sort_column.desc(), id_column.desc()] if descending else [sort_column.asc(), id_column.asc()]
+    # Fetch one extra row to know if there is a next page without running a COUNT
+    rows = query.order_by(*order).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        last_id = getattr(last, id_column.key)
+        next_cursor = encode_cursor([last_id] if same_column else [getattr(last, sort_column.key), last_id])
+    return rows, next_cursor
+
+APPROXIMATE_COUNT_CAP = 10000
+
+def approximate_count(query, table_name, filtered, cap=APPROXIMATE_COUNT_CAP):
+    """
+    Cheap total for list endpoints, never a full COUNT(*) of a big table. Returns (count, exact):
+    - unfiltered on MySQL: InnoDB's row estimate from the table statistics (not exact)
+    - otherwise: COUNT over at most 'cap' rows, so a count of 'cap' means 'cap or more'
+    """
+    session = query.session
+    if not filtered and session.get_bind().dialect.name == 'mysql':
+        estimate = session.execute(
+            text('SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = :name'),
+            {'name': table_name}).scalar()
+        return int(estimate or 0), False
+    count = query.limit(cap).count()
+    return count, count < cap
+
+# Streaming (NDJSON) helpers for the list endpoints.
+# Opt-in with 'Accept: application/x-ndjson': rows are read in keyset chunks of STREAM_BATCH_SIZE (see
+# iter_keyset) and every row is sent as one JSON line as soon as it is serialized, so memory per
+# request stays flat and the first bytes go out before the whole table has been read.
+NDJSON_MIMETYPE = 'application/x-ndjson'
+STREAM_BATCH_SIZE = 1000
+
+def iter_keyset(query, id_column, batch_size=STREAM_BATCH_SIZE):
+    """
+    Rows of a query in id order, fetched in keyset pages of batch_size rows (one short SELECT each).
+    Unlike yield_per, it doesn't rely on a server-side cursor: mysql-connector buffers the whole result of a query
+    """
+    cursor_values = None
+    while True:
+        rows, next_cursor = keyset_page(query, id_column, id_column, cursor_values, batch_size)
+        yield from rows
+        if next_cursor is None:
+            return
+        cursor_values = [getattr(rows[-1], id_column.key)]
+
+def wants_ndjson():
+    """
+    True if the client prefers NDJSON over JSON (browsers sending */* keep getting JSON)
+    """
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+def ndjson_response(result, status):
+    """
+    Turn the (records, status) returned by a stream_*_logic function into a streamed NDJSON response.
+    Errors (status other than 200) are returned as regular JSON
+    """
+    if status != 200:
+        return jsonify(result), status
+    def generate():
+        for record in result:
+            yield current_app.json.dumps(record) + '\n'
+    # stream_with_context keeps the app/request context (and so the db session) alive while streaming
+    return Response(stream_with_context(generate()), status=status, mimetype=NDJSON_MIMETYPE)
+
+def iter_records(stream, content_type):
+    """
+    Lazily parse a request body stream of CSV (header row + rows) or NDJSON (one JSON object per line) records.
+    Yields (line_number, record) where record is a dict, or None for an unparseable NDJSON line.
+    Returns None if the content type isn't supported
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    if content_type == 'text/csv':
+        reader = csv.DictReader(text)
+        return ((reader.line_num, record) for record in reader)
+    if content_type == NDJSON_MIMETYPE:
+        return _iter_ndjson(text)
+    return None
+
+def _iter_ndjson(text):
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield line_number, record if isinstance(record, dict) else None
+
+def dispatch_subrequest(path, environ=None):
+    """
+    Run a GET request for 'path' (with query string) through the current app, with its own app/request context
+    (own g, DB session and instrumentation) as if it came from a client. The client's cookies are forwarded (eg: the
+    one keeping its reads on the primary right after a write). Returns (status, JSON body or None)
+    """
+    app = current_app._get_current_object()
+    headers = {'Accept': 'application/json'}
+    if has_request_context() and 'Cookie' in request.headers:
+        headers['Cookie'] = request.headers['Cookie']
+    with app.app_context(), app.test_request_context(path, method='GET', headers=headers,
+                                                     environ_overrides=environ or {}):
+        try:
+            response = app.full_dispatch_request()
+        except Exception as e:
+            app.logger.error(f'Error in sub-request {path}: {e}')
+            return 500, {'message': 'Internal server error'}
+        return response.status_code, response.get_json(silent=True)
+
+# Input sanitization
+# bleach.clean(value, strip=True) only changes markup characters (<, >, &) and control characters other than tab
+# and newline. Values without any of them (most names, all valid usernames and emails) are returned as they are,
+# without parsing them as HTML
+NEEDS_CLEANING_RE = re.compile(r'[<>&\x00-\x08\x0b-\x1f]')
+USERNAME_RE = re.compile(r'[\w.@+-]{1,255}')
+EMAIL_RE = re.compile(r'[^@\s<>&"\x00-\x1f]{1,64}@[^@\s<>&"\x00-\x1f]+\.[^@\s<>&"\x00-\x1f]+')
+EMAIL_MAX_LENGTH = 255
+INVALID_USERNAME_MESSAGE = 'username must be 1 to 255 letters, digits or . @ + - _'
+INVALID_EMAIL_MESSAGE = 'Invalid e-mail address'
+# Cleaned values are memoized (eg: the same description on every row of an import), up to this many
+SANITIZE_MEMO_SIZE = 4096
+# Longer values aren't memoized, so the memo stays small
+SANITIZE_MEMO_MAX_LENGTH = 1000
+_cleaners = threading.local()
+
+def clean_username(value):
+    """
+    The username if it's 1 to 255 letters, digits or . @ + - _ (nothing to strip), otherwise None
+    """
+    if isinstance(value, str) and USERNAME_RE.fullmatch(value):
+        return value
+    return None
+
+def clean_email(value):
+    """
+    The e-mail address if it looks like one (local@domain.tld, no markup or spaces), otherwise None
+    """
+    if isinstance(value, str) and len(value) <= EMAIL_MAX_LENGTH and EMAIL_RE.fullmatch(value):
+        return value
+    return None
+
+def clean_text(value):
+    """
+    Strip HTML tags from free text (store and product names and descriptions), same result as
+    bleach.clean(value, strip=True). Only values with markup or control characters go through bleach
+    """
+    if not NEEDS_CLEANING_RE.search(value):
+        return value
+    if len(value) <= SANITIZE_MEMO_MAX_LENGTH:
+        return _clean_markup_memo(value)
+    return _clean_markup(value)
+
+def _clean_markup(value):
+    # bleach (and its html5lib parser) is only imported by the first call, and every thread reuses its own Cleaner
+    # (bleach.clean() builds a new one per call, Cleaner instances aren't thread safe)
+    cleaner = getattr(_cleaners, 'cleaner', None)
+    if cleaner is None:
+        from bleach.sanitizer import Cleaner
+        cleaner = _cleaners.cleaner = Cleaner(strip=True)
+    return cleaner.clean(value)
+
+_clean_markup_memo = functools.lru_cache(maxsize=SANITIZE_MEMO_SIZE)(_clean_markup)
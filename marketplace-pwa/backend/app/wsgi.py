@@ -0,0 +1,8 @@
+"""
+WSGI entry point for any kind of backend, picked with APP_KIND=customer|admin|all (see app/factory.py)
+Run from the backend folder: APP_KIND=all gunicorn -c gunicorn.conf.py app.wsgi:app
+"""
+import os
+from .factory import create_app
+
+app = create_app(os.environ.get('APP_KIND', 'customer'))
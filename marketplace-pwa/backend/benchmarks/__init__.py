@@ -0,0 +1,20 @@
+"""
+Load testing / benchmark harness for the marketplace API
+1. Seed a database with a given volume of users, stores, products and orders (SQLite file or a local MySQL):
+    python -m benchmarks seed --database sqlite:////tmp/bench.db --users 10000 --stores 500 --products 50000 --orders 20000
+2. Run a weighted mix of scenarios (browse catalog, login, place order, admin listing) for some time and save
+   throughput and p50/p95/p99 latencies per scenario as JSON:
+    python -m benchmarks run --database sqlite:////tmp/bench.db --duration 30 --concurrency 8 --out bench-abc123.json
+   By default requests go through both Flask apps in process (no network, measures the app and the DB).
+   --customer-url/--admin-url target running servers instead (eg: gunicorn, see README)
+3. Compare two result files, exit code 1 if any scenario regressed more than --max-regression (eg: in CI):
+    python -m benchmarks compare bench-main.json bench-abc123.json --max-regression 0.15
+   run --baseline <file> does the same right after the run
+4. Bytes on the wire and CPU per response of the list endpoints, for each JSON serializer and gzip/brotli:
+    python -m benchmarks payloads --database sqlite:////tmp/bench.db
+5. CPU per record of the input sanitization (app/shared/utils.py) against bleach.clean on every field:
+    python -m benchmarks sanitize
+6. Cost of authenticating a request (decode_token + principal lookup), with cold and warm caches:
+    python -m benchmarks auth --database sqlite:////tmp/bench.db
+Run everything from the backend folder. Seeding and runs are deterministic for a given --seed
+"""
@@ -0,0 +1,207 @@
+"""
+Command line of the benchmark harness, see benchmarks/__init__.py
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from .import_time import IMPORT_TIME_BUDGET_MS
+
+def create_apps():
+    from app.factory import create_app
+    return create_app('customer'), create_app('admin')
+
+def seed_command(args):
+    from .seed import seed_database
+    customer_app, _ = create_apps()
+    start = time.perf_counter()
+    with customer_app.app_context():
+        seed_database(args.users, args.stores, args.products, args.orders, seed=args.seed, reset=args.reset)
+    print(f'Seeded {args.users} users, {args.stores} stores, {args.products} products and {args.orders} orders '
+          f'in {time.perf_counter() - start:.1f}s')
+
+def count_volumes(app):
+    from app.shared.models import User, Store, Product, db
+    with app.app_context():
+        return {'users': db.session.query(db.func.max(User.id)).scalar() or 0,
+                'stores': db.session.query(db.func.max(Store.id)).scalar() or 0,
+                'products': db.session.query(db.func.max(Product.id)).scalar() or 0}
+
+def run_command(args):
+    from .report import build_result, compare_results, load_result, print_result, save_result
+    from .scenarios import MIXES, SCENARIOS, Context, HttpClient, InProcessClient, login
+    from .seed import ADMIN_USERNAME, bench_username
+    mix = MIXES[args.mix]
+    customer_app, admin_app = create_apps()
+    volumes = count_volumes(customer_app)
+    if not volumes['products']:
+        sys.exit('The database is empty, run "python -m benchmarks seed" first')
+
+    def make_client():
+        if args.customer_url:
+            return HttpClient(args.customer_url, args.admin_url)
+        return InProcessClient(customer_app, admin_app)
+
+    # Logins of the workers happen before the clock starts, the 'login' scenario measures them
+    setup_client = make_client()
+    admin_token = login(setup_client, ADMIN_USERNAME)
+    contexts = []
+    for worker in range(args.concurrency):
+        rng = random.Random(args.seed + worker)
+        username = bench_username(rng.randint(2, volumes['users'])) if volumes['users'] > 1 else ADMIN_USERNAME
+        contexts.append(Context(make_client(), rng, volumes, login(setup_client, username), admin_token))
+
+    names, weights = list(mix), list(mix.values())
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    # Warm-up requests (connection pool, caches) aren't recorded
+    warmup_end = time.perf_counter() + args.warmup
+    deadline = warmup_end + args.duration
+
+    def worker_loop(ctx):
+        local_samples = {name: [] for name in names}
+        local_errors = {name: 0 for name in names}
+        while True:
+            if time.perf_counter() >= deadline:
+                break
+            name = ctx.rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                status = SCENARIOS[name](ctx)
+            except Exception:
+                status = None
+            elapsed = time.perf_counter() - start
+            if start < warmup_end:
+                continue
+            local_samples[name].append(elapsed)
+            if status is None or status >= 400:
+                local_errors[name] += 1
+        with lock:
+            for name in names:
+                samples[name].extend(local_samples[name])
+                errors[name] += local_errors[name]
+
+    threads = [threading.Thread(target=worker_loop, args=(ctx,)) for ctx in contexts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    meta = {'mix': args.mix, 'concurrency': args.concurrency, 'seed': args.seed, 'volumes': volumes,
+            'target': args.customer_url or 'in-process', 'database': customer_app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0]}
+    result = build_result(meta, samples, errors, args.duration)
+    print_result(result)
+    if args.out:
+        save_result(result, args.out)
+        print(f'Saved results to {args.out}')
+    if args.baseline:
+        report_regressions(compare_results(load_result(args.baseline), result, args.max_regression))
+
+def compare_command(args):
+    from .report import compare_results, load_result
+    report_regressions(compare_results(load_result(args.baseline), load_result(args.current), args.max_regression))
+
+def import_time_command(args):
+    from .import_time import check_import_time
+    if not check_import_time(args.kind, args.budget_ms, repeat=args.repeat):
+        sys.exit('Import time over budget')
+
+def payloads_command(args):
+    # Every request has to serialize its body, so no cached responses
+    os.environ['RESPONSE_CACHE_TTL'] = '0'
+    from .payloads import print_payloads, run_payloads
+    from .report import save_result
+    rows = run_payloads(repeat=args.repeat)
+    print_payloads(rows)
+    if args.out:
+        save_result({'payloads': rows}, args.out)
+        print(f'Saved results to {args.out}')
+
+def sanitize_command(args):
+    from .sanitize import print_sanitize, run_sanitize
+    print_sanitize(run_sanitize(args.records, args.markup_ratio))
+
+def auth_command(args):
+    from .auth import print_auth, run_auth
+    print_auth(run_auth(args.users, args.repeat))
+
+def report_regressions(regressions):
+    if regressions:
+        print('Regressions:')
+        for regression in regressions:
+            print(f'  {regression}')
+        sys.exit(1)
+    print('No regressions')
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Marketplace API benchmark harness')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed = commands.add_parser('seed', help='Create and fill a benchmark database')
+    seed.add_argument('--database', help='SQLAlchemy URL (default: DATABASE_URL)')
+    seed.add_argument('--users', type=int, default=1000)
+    seed.add_argument('--stores', type=int, default=100)
+    seed.add_argument('--products', type=int, default=10000)
+    seed.add_argument('--orders', type=int, default=5000)
+    seed.add_argument('--seed', type=int, default=42)
+    seed.add_argument('--reset', action='store_true', help='Drop every table first')
+    seed.set_defaults(func=seed_command)
+
+    run = commands.add_parser('run', help='Run a scenario mix and report throughput and latency')
+    run.add_argument('--database', help='SQLAlchemy URL (default: DATABASE_URL)')
+    run.add_argument('--mix', default='default', choices=['default', 'catalog', 'checkout', 'admin', 'login_storm'])
+    run.add_argument('--duration', type=float, default=30, help='Measured seconds')
+    run.add_argument('--warmup', type=float, default=3, help='Unmeasured seconds before the measurement')
+    run.add_argument('--concurrency', type=int, default=8, help='Concurrent simulated users (threads)')
+    run.add_argument('--seed', type=int, default=42)
+    run.add_argument('--customer-url', help='Benchmark a running customer backend instead of the in-process apps')
+    run.add_argument('--admin-url', help='Running admin backend (default: --customer-url)')
+    run.add_argument('--out', help='Save the results to this JSON file')
+    run.add_argument('--baseline', help='Fail if the results regressed compared to this JSON file')
+    run.add_argument('--max-regression', type=float, default=0.2)
+    run.set_defaults(func=run_command)
+
+    compare = commands.add_parser('compare', help='Compare two result files')
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--max-regression', type=float, default=0.2)
+    compare.set_defaults(func=compare_command)
+
+    import_time = commands.add_parser('import-time', help='Fail if importing and creating the app is over budget')
+    import_time.add_argument('--kind', default='all', choices=['customer', 'admin', 'all'])
+    import_time.add_argument('--budget-ms', type=float, default=IMPORT_TIME_BUDGET_MS)
+    import_time.add_argument('--repeat', type=int, default=3)
+    import_time.set_defaults(func=import_time_command)
+
+    payloads = commands.add_parser('payloads', help='Bytes and CPU per response of the list endpoints, per serializer and encoding')
+    payloads.add_argument('--database', help='SQLAlchemy URL of a seeded database (default: DATABASE_URL)')
+    payloads.add_argument('--repeat', type=int, default=50, help='Requests per endpoint, serializer and encoding')
+    payloads.add_argument('--out', help='Save the results to this JSON file')
+    payloads.set_defaults(func=payloads_command)
+
+    sanitize = commands.add_parser('sanitize', help='CPU per record of the input sanitization against bleach.clean')
+    sanitize.add_argument('--records', type=int, default=20000)
+    sanitize.add_argument('--markup-ratio', type=float, default=0.1, help='Share of descriptions with HTML')
+    sanitize.set_defaults(func=sanitize_command)
+
+    auth = commands.add_parser('auth', help='Cost of authenticating a request (decode_token + principal lookup), cold and warm')
+    auth.add_argument('--database', help='SQLAlchemy URL of a seeded database (default: DATABASE_URL)')
+    auth.add_argument('--users', type=int, default=1000, help='Distinct users (tokens) per pass')
+    auth.add_argument('--repeat', type=int, default=5)
+    auth.set_defaults(func=auth_command)
+
+    args = parser.parse_args()
+    # Config reads the env at import time, so it must be set before anything imports the app
+    if getattr(args, 'database', None):
+        os.environ['DATABASE_URL'] = args.database
+    os.environ.setdefault('SECRET_KEY', 'benchmark-secret-key-not-for-production')
+    if args.func is run_command and not args.customer_url:
+        # No order worker runs next to the in-process apps: checkouts are created during the request (201)
+        os.environ['ORDER_QUEUE_ENABLED'] = 'false'
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Cost of authenticating a request (what token_required runs before the route): decode_token plus the principal
+lookup, cold (token and user caches empty: JWT signature check and a users query per request) and warm (both
+memoized, see app/shared/auth.py)
+"""
+import time
+from types import SimpleNamespace
+
+def authenticate(tokens):
+    from app.shared.auth import decode_token, get_user_principal
+    for token in tokens:
+        if get_user_principal(decode_token(token)) is None:
+            raise AssertionError('A benchmark token was not authenticated')
+
+def run_auth(users=1000, repeat=5):
+    """
+    Returns {variant: µs per authentication}. Every pass authenticates one token for each of the first 'users' users
+    """
+    from app.factory import create_app
+    from app.shared.auth import generate_token, token_cache, user_cache
+    from app.shared.models import User, db
+    app = create_app('customer')
+    with app.app_context():
+        user_ids = [user_id for user_id, in db.session.query(User.id).order_by(User.id).limit(users)]
+        if not user_ids:
+            raise SystemExit('No users: seed the database first (python -m benchmarks seed)')
+        tokens = [generate_token(SimpleNamespace(id=user_id)) for user_id in user_ids]
+        authenticate(tokens[:10])  # The first query (connection, statement compilation) isn't measured
+        cold = 0.0
+        for _ in range(repeat):
+            token_cache.clear()
+            user_cache.clear()
+            start = time.perf_counter()
+            authenticate(tokens)
+            cold += time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(repeat):
+            authenticate(tokens)
+        warm = time.perf_counter() - start
+        db.session.remove()
+    return {'cold (JWT + users query)': cold * 1e6 / (repeat * len(tokens)),
+            'warm (token + user cache)': warm * 1e6 / (repeat * len(tokens))}
+
+def print_auth(results):
+    baseline = results['cold (JWT + users query)']
+    for name, per_request in results.items():
+        print(f'{name:<30} {per_request:10.2f} µs/request  {baseline / per_request:7.1f}x')
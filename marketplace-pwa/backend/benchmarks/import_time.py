@@ -0,0 +1,44 @@
+"""
+Startup import cost of the app factory, from python -X importtime in a fresh interpreter
+"""
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Budget of python -X importtime for create_app('all'): ~750 ms on a small CI box, ~1000 ms before alembic and bleach became lazy
+IMPORT_TIME_BUDGET_MS = 900
+
+def measure_import_time(kind):
+    """
+    Import and create the app of this kind in a new process. Returns (total ms, {top level package: ms})
+    """
+    code = f'from app.factory import create_app; create_app({kind!r})'
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URL', 'sqlite://')
+    env.setdefault('SECRET_KEY', 'import-time-check')
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=BACKEND_DIR, env=env,
+                               capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr)
+    total_us = 0
+    packages = {}
+    for line in completed.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        total_us += int(self_us)
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + int(self_us) / 1000
+    return total_us / 1000, packages
+
+def check_import_time(kind, budget_ms, repeat=3, top=10):
+    """
+    Best of 'repeat' runs (the first ones also warm the .pyc and OS caches). Returns True if within budget
+    """
+    total_ms, packages = min((measure_import_time(kind) for _ in range(repeat)), key=lambda run: run[0])
+    print(f'Import time of create_app({kind!r}): {total_ms:.1f} ms (budget {budget_ms:.0f} ms)')
+    for name, package_ms in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f'  {package_ms:8.1f} ms  {name}')
+    return total_ms <= budget_ms
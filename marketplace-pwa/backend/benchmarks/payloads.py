@@ -0,0 +1,63 @@
+"""
+Bytes on the wire and CPU time per response of the list endpoints, for every JSON serializer and content encoding
+(see app/shared/serialization.py and app/shared/compression.py). Runs in process against a seeded database, with
+the response cache off so every request serializes (and compresses) its body
+"""
+import time
+from .scenarios import ADMIN_PREFIX, InProcessClient, login
+from .seed import ADMIN_USERNAME, bench_username
+
+LIST_ENDPOINTS = [
+    ('stores', '/api/stores?limit=50', None),
+    ('products', '/api/products?limit=100', None),
+    ('products by store', '/api/products?store_id=1&sort=price&limit=100', None),
+    ('orders', '/api/orders?limit=50', 'user'),
+    ('admin users', f'{ADMIN_PREFIX}/users?limit=100', 'admin'),
+]
+
+def make_config(base, serializer):
+    return type('PayloadBenchmarkConfig', (base,), {'JSON_SERIALIZER': serializer, 'COMPRESS_MIN_SIZE': 0})
+
+def measure_endpoint(client, path, token, encoding, repeat):
+    """
+    Returns (status, body bytes, CPU ms per response) for this Accept-Encoding
+    """
+    headers = {'Accept-Encoding': encoding}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    response = client.get(path, headers=headers)  # warm-up, also gives the body size
+    start = time.process_time()
+    for _ in range(repeat):
+        client.get(path, headers=headers)
+    cpu_ms = (time.process_time() - start) * 1000 / repeat
+    return response.status_code, len(response.get_data()), cpu_ms
+
+def run_payloads(repeat=50):
+    from app.factory import create_app
+    from app.shared.compression import available_encodings
+    from app.shared.config import Config
+    from app.shared.serialization import orjson
+    serializers = ['json'] + (['orjson'] if orjson is not None else [])
+    encodings = ['identity'] + list(available_encodings())
+    rows = []
+    for serializer in serializers:
+        config = make_config(Config, serializer)
+        customer_app, admin_app = create_app('customer', config), create_app('admin', config)
+        setup_client = InProcessClient(customer_app, admin_app)
+        tokens = {'user': login(setup_client, bench_username(2)), 'admin': login(setup_client, ADMIN_USERNAME)}
+        clients = {'customer': customer_app.test_client(), 'admin': admin_app.test_client()}
+        for name, path, auth in LIST_ENDPOINTS:
+            client = clients['admin' if path.startswith(ADMIN_PREFIX) else 'customer']
+            for encoding in encodings:
+                status, size, cpu_ms = measure_endpoint(client, path, tokens.get(auth), encoding, repeat)
+                rows.append({'endpoint': name, 'serializer': serializer, 'encoding': encoding, 'status': status,
+                             'bytes': size, 'cpu_ms': round(cpu_ms, 3)})
+    return rows
+
+def print_payloads(rows):
+    print(f"{'endpoint':<20} {'serializer':<10} {'encoding':<9} {'status':>6} {'bytes':>9} {'ratio':>6} {'cpu ms':>8}")
+    identity_sizes = {(row['endpoint'], row['serializer']): row['bytes'] for row in rows if row['encoding'] == 'identity'}
+    for row in rows:
+        identity = identity_sizes.get((row['endpoint'], row['serializer'])) or 1
+        print(f"{row['endpoint']:<20} {row['serializer']:<10} {row['encoding']:<9} {row['status']:>6} {row['bytes']:>9} "
+              f"{row['bytes'] / identity:>6.2f} {row['cpu_ms']:>8.3f}")
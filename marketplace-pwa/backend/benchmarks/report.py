@@ -0,0 +1,79 @@
+"""
+Latency statistics, JSON result files and comparison between two runs
+"""
+import datetime
+import json
+import math
+import subprocess
+
+def percentile(sorted_values, fraction):
+    # Nearest rank, values must be sorted
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarize(latencies, errors, elapsed):
+    """
+    Stats of one scenario from its latencies in seconds
+    """
+    values = sorted(latencies)
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'throughput_rps': round(len(values) / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': round(sum(values) * 1000 / len(values), 3) if values else 0.0,
+        'p50_ms': round(percentile(values, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(values, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(values, 0.99) * 1000, 3),
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def build_result(meta, samples, errors, elapsed):
+    """
+    samples: scenario -> latencies, errors: scenario -> failed count
+    """
+    meta = dict(meta, commit=git_commit(), timestamp=datetime.datetime.utcnow().isoformat() + 'Z',
+                duration_s=round(elapsed, 3))
+    scenarios = {name: summarize(latencies, errors.get(name, 0), elapsed) for name, latencies in sorted(samples.items())}
+    every_latency = [latency for latencies in samples.values() for latency in latencies]
+    return {'meta': meta, 'scenarios': scenarios,
+            'total': summarize(every_latency, sum(errors.values()), elapsed)}
+
+def save_result(result, path):
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=2)
+
+def load_result(path):
+    with open(path) as f:
+        return json.load(f)
+
+def print_result(result):
+    print(f"{'scenario':22} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in list(result['scenarios'].items()) + [('TOTAL', result['total'])]:
+        print(f"{name:22} {stats['requests']:>9} {stats['errors']:>7} {stats['throughput_rps']:>9} "
+              f"{stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9}")
+
+def compare_results(baseline, current, max_regression):
+    """
+    Returns the list of regressions: p95 latency up or throughput down by more than max_regression (0.1 = 10%)
+    or a scenario that didn't fail before failing now. Only scenarios present in both runs are compared
+    """
+    regressions = []
+    for name, before in baseline['scenarios'].items():
+        after = current['scenarios'].get(name)
+        if not after or not before['requests']:
+            continue
+        if before['p95_ms'] and after['p95_ms'] > before['p95_ms'] * (1 + max_regression):
+            regressions.append(f"{name}: p95 {before['p95_ms']} ms -> {after['p95_ms']} ms")
+        if after['throughput_rps'] < before['throughput_rps'] * (1 - max_regression):
+            regressions.append(f"{name}: throughput {before['throughput_rps']} -> {after['throughput_rps']} req/s")
+        if after['errors'] and not before['errors']:
+            regressions.append(f"{name}: {after['errors']} errors (none before)")
+    return regressions
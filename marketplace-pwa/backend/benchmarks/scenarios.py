@@ -0,0 +1,159 @@
+"""
+Clients and request scenarios of the benchmark. A scenario is one user action (one or a few requests) and
+returns the HTTP status of its last request. Mixes are weighted sets of scenarios
+"""
+import json
+import time
+import urllib.error
+import urllib.request
+from .seed import ADMIN_USERNAME, BENCH_PASSWORD, WORDS, bench_username
+
+ADMIN_PREFIX = '/admin/api'
+# Queued checkouts (202) are polled until the order worker is done with them
+ORDER_POLL_INTERVAL = 0.05
+ORDER_POLL_TIMEOUT = 30
+
+class InProcessClient:
+    """
+    Calls both Flask apps through their test clients (no network or server in between)
+    """
+    def __init__(self, customer_app, admin_app):
+        self._customer = customer_app.test_client()
+        self._admin = admin_app.test_client()
+
+    def request(self, method, path, body=None, token=None):
+        client = self._admin if path.startswith(ADMIN_PREFIX) else self._customer
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        response = client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.get_json(silent=True)
+
+class HttpClient:
+    """
+    Calls running servers (eg: gunicorn) over HTTP
+    """
+    def __init__(self, customer_url, admin_url):
+        self._customer_url = customer_url.rstrip('/')
+        self._admin_url = (admin_url or customer_url).rstrip('/')
+
+    def request(self, method, path, body=None, token=None):
+        base = self._admin_url if path.startswith(ADMIN_PREFIX) else self._customer_url
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = urllib.request.Request(base + path, data=data, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return response.status, json.loads(response.read() or b'null')
+        except urllib.error.HTTPError as error:
+            return error.code, None
+
+def login(client, username):
+    status, body = client.request('POST', '/api/login', {'username': username, 'password': BENCH_PASSWORD})
+    return body['token'] if status == 200 else None
+
+class Context:
+    """
+    What the scenarios of one worker need: the client, its rng, logged in tokens and the seeded volumes
+    """
+    def __init__(self, client, rng, volumes, user_token, admin_token):
+        self.client = client
+        self.rng = rng
+        self.volumes = volumes
+        self.user_token = user_token
+        self.admin_token = admin_token
+
+def browse_catalog(ctx):
+    # Landing page, then a store and two pages of its products
+    client, rng = ctx.client, ctx.rng
+    client.request('GET', '/api/stores?limit=20')
+    store_id = rng.randint(1, ctx.volumes['stores'])
+    client.request('GET', f'/api/stores/{store_id}')
+    status, body = client.request('GET', f'/api/products?store_id={store_id}&sort=price&limit=20')
+    if status == 200 and body.get('next_cursor'):
+        status, _ = client.request('GET', f"/api/products?store_id={store_id}&sort=price&limit=20&cursor={body['next_cursor']}")
+    return status
+
+def view_product(ctx):
+    status, _ = ctx.client.request('GET', f"/api/products/{ctx.rng.randint(1, ctx.volumes['products'])}")
+    return status
+
+def search_products(ctx):
+    status, _ = ctx.client.request('GET', f"/api/products/search?q={'+'.join(ctx.rng.sample(WORDS, 2))}&limit=20")
+    return status
+
+def login_user(ctx):
+    username = bench_username(ctx.rng.randint(2, ctx.volumes['users'])) if ctx.volumes['users'] > 1 else ADMIN_USERNAME
+    status, _ = ctx.client.request('POST', '/api/login', {'username': username, 'password': BENCH_PASSWORD})
+    return status
+
+def place_order(ctx):
+    rng = ctx.rng
+    items = [{'product_id': product_id, 'quantity': rng.randint(1, 3)}
+             for product_id in {rng.randint(1, ctx.volumes['products']) for _ in range(rng.randint(1, 4))}]
+    status, body = ctx.client.request('POST', '/api/orders', {'items': items}, token=ctx.user_token)
+    if status != 202:
+        return status
+    # Accepted isn't done: the checkout lasts until the order is created (or rejected) by the order worker
+    status_url = body['status_url']
+    deadline = time.perf_counter() + ORDER_POLL_TIMEOUT
+    while time.perf_counter() < deadline:
+        time.sleep(ORDER_POLL_INTERVAL)
+        status, body = ctx.client.request('GET', status_url, token=ctx.user_token)
+        if status != 200:
+            return status
+        if body['status'] == 'completed':
+            return 201
+        if body['status'] == 'failed':
+            return 409  # rejected checkouts (eg: out of stock) count as errors
+    return None
+
+def list_orders(ctx):
+    status, _ = ctx.client.request('GET', '/api/orders?limit=20', token=ctx.user_token)
+    return status
+
+def admin_list_users(ctx):
+    client = ctx.client
+    status, body = client.request('GET', '/admin/api/users?limit=50', token=ctx.admin_token)
+    if status == 200 and body.get('next_cursor'):
+        status, _ = client.request('GET', f"/admin/api/users?limit=50&cursor={body['next_cursor']}", token=ctx.admin_token)
+    return status
+
+def admin_search_users(ctx):
+    status, _ = ctx.client.request('GET', f'/admin/api/users?q=bench_user{ctx.rng.randint(1, 99)}', token=ctx.admin_token)
+    return status
+
+def admin_search_email(ctx):
+    # Email prefix (the other half of the OR), sorted by username like the admin search screen
+    status, _ = ctx.client.request('GET', f'/admin/api/users?q=user{ctx.rng.randint(1, 99)}%40&sort=username',
+                                   token=ctx.admin_token)
+    return status
+
+def admin_sales(ctx):
+    status, _ = ctx.client.request('GET', '/admin/api/analytics/sales?period=week', token=ctx.admin_token)
+    return status
+
+SCENARIOS = {
+    'browse_catalog': browse_catalog,
+    'view_product': view_product,
+    'search_products': search_products,
+    'login': login_user,
+    'place_order': place_order,
+    'list_orders': list_orders,
+    'admin_list_users': admin_list_users,
+    'admin_search_users': admin_search_users,
+    'admin_search_email': admin_search_email,
+    'admin_sales': admin_sales,
+}
+
+# scenario -> weight. 'default' is roughly a storefront: mostly browsing, some logins and orders, a bit of admin
+MIXES = {
+    'default': {'browse_catalog': 40, 'view_product': 20, 'search_products': 10, 'login': 5, 'place_order': 10,
+                'list_orders': 5, 'admin_list_users': 4, 'admin_search_users': 2, 'admin_search_email': 1,
+                'admin_sales': 3},
+    'catalog': {'browse_catalog': 60, 'view_product': 25, 'search_products': 15},
+    'checkout': {'place_order': 70, 'list_orders': 20, 'login': 10},
+    'admin': {'admin_list_users': 40, 'admin_search_users': 25, 'admin_search_email': 15, 'admin_sales': 20},
+    # Password hashing under a burst of logins must not starve the catalog: compare the catalog p99 with 'catalog'
+    'login_storm': {'login': 50, 'browse_catalog': 35, 'view_product': 15},
+}
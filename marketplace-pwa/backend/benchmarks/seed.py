@@ -0,0 +1,75 @@
+"""
+Seed a benchmark database with bulk inserts (no ORM objects, no per user password hashing)
+"""
+import datetime
+import random
+from app.shared.analytics import backfill_sales_rollups
+from app.shared.models import User, Store, Product, Order, OrderItem, db
+from app.shared.passwords import hash_password
+
+BENCH_PASSWORD = 'bench-password'
+ADMIN_USERNAME = 'bench_admin'
+INSERT_BATCH_SIZE = 10000
+WORDS = ['red', 'blue', 'green', 'wooden', 'steel', 'organic', 'vintage', 'classic', 'mini', 'large', 'smart',
+         'handmade', 'leather', 'cotton', 'ceramic', 'glass', 'lamp', 'chair', 'table', 'mug', 'shirt', 'shoes',
+         'backpack', 'watch', 'phone', 'case', 'book', 'candle', 'plant', 'bottle', 'jacket', 'scarf']
+
+def bench_username(index):
+    return f'bench_user{index}'
+
+def insert_batches(table, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= INSERT_BATCH_SIZE:
+            db.session.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+
+def product_name(rng):
+    return ' '.join(rng.sample(WORDS, 3))
+
+def seed_database(users, stores, products, orders, seed=42, reset=False):
+    """
+    Create the tables and insert the given volumes. Must run inside an app context. User ids are 1..users,
+    user 1 is the admin (ADMIN_USERNAME) and every user has the password BENCH_PASSWORD
+    """
+    rng = random.Random(seed)
+    if reset:
+        db.drop_all()
+    db.create_all()
+    # Every user shares one hash, hashing millions of passwords would take hours
+    password_hash = hash_password(BENCH_PASSWORD)
+    insert_batches(User.__table__, ({
+        'id': i, 'username': ADMIN_USERNAME if i == 1 else bench_username(i), 'email': f'user{i}@bench.example',
+        'password_hash': password_hash, 'is_admin': i == 1} for i in range(1, users + 1)))
+    insert_batches(Store.__table__, ({
+        'id': i, 'name': f'Store {i} {rng.choice(WORDS)}', 'description': 'Benchmark store',
+        'owner_id': rng.randint(1, users)} for i in range(1, stores + 1)))
+    # Stock left empty (unlimited) so placing orders never runs out during a run
+    product_rows = [{
+        'id': i, 'name': product_name(rng), 'description': ' '.join(rng.sample(WORDS, 8)),
+        'price': round(rng.uniform(1, 500), 2), 'store_id': rng.randint(1, stores), 'sku': f'SKU-{i}',
+        'stock': None} for i in range(1, products + 1)]
+    insert_batches(Product.__table__, product_rows)
+    # (price, store_id) by product id, for the checkout snapshot of the order items
+    catalog = [None] + [(row['price'], row['store_id']) for row in product_rows]
+    del product_rows
+    start = datetime.datetime.utcnow() - datetime.timedelta(days=90)
+    order_rows, item_rows = [], []
+    for i in range(1, orders + 1):
+        items = {rng.randint(1, products): rng.randint(1, 3) for _ in range(rng.randint(1, 4))}
+        order_rows.append({'id': i, 'user_id': rng.randint(1, users), 'total_amount': 0.0,
+                           'order_date': start + datetime.timedelta(seconds=rng.randint(0, 90 * 86400))})
+        item_rows.extend({'order_id': i, 'product_id': product_id, 'quantity': quantity,
+                          'unit_price': catalog[product_id][0], 'store_id': catalog[product_id][1]}
+                         for product_id, quantity in items.items())
+    insert_batches(Order.__table__, order_rows)
+    insert_batches(OrderItem.__table__, item_rows)
+    # Order totals and sales rollups from the inserted items, the same numbers the API would have produced
+    db.session.execute(Order.__table__.update().values(total_amount=(
+        db.select(db.func.sum(OrderItem.quantity * OrderItem.unit_price))
+        .where(OrderItem.order_id == Order.id).scalar_subquery())))
+    db.session.commit()
+    backfill_sales_rollups()
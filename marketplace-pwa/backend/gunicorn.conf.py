@@ -0,0 +1,45 @@
+# Gunicorn settings for both backends. Every value can be tuned from env vars without rebuilding the image
+# Usage (from the backend folder): gunicorn -c gunicorn.conf.py app.customer.wsgi:app  (or app.admin.wsgi:app)
+# Deploying new code: with preload_app (default) the code is loaded once in the master, and kill -HUP only re-forks
+# workers from it, so it keeps serving the old code. Either restart gunicorn (eg: the container), or without downtime:
+# kill -USR2 <old master pid> (starts a new master with the new code), then kill -WINCH <old master pid> (its workers
+# finish their in-flight requests and exit) and kill -QUIT <old master pid>. With GUNICORN_PRELOAD=false, kill -HUP
+# is enough: each new worker imports the new code
+import multiprocessing
+import os
+import shutil
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# Processes: CPU bound work (JSON serialization, JWT) scales with processes. Default is the usual 2 * CPUs + 1
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Threads per process: requests waiting on MySQL release the GIL, so a few threads add throughput cheaply
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Reuse client connections (eg: the frontend containers or a load balancer) between requests
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# Load the app once in the master before forking, so workers share its memory pages (copy-on-write)
+# and start faster. Notice: Nothing opening connections/threads/processes must run at import time
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# Recycle workers now and then (with jitter so they don't all restart together) to cap slow memory growth
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+
+accesslog = os.environ.get('GUNICORN_ACCESSLOG', '-')
+
+# Prometheus multiprocess mode: every worker writes its metrics to files in this folder, so a scrape of /metrics
+# (served by any worker) sums all of them. Must be set before the app (and prometheus_client) is imported, so here
+# rather than in a server hook (with preload_app the app is imported before on_starting runs)
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus_multiproc')
+# Metrics of a previous run would be added to the new ones
+shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,27 @@
+"""products fulltext index
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 07:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FULLTEXT indexes only exist in MySQL, other databases use the LIKE fallback of search_products_logic
+    if op.get_bind().dialect.name == 'mysql':
+        op.create_index('ix_products_fulltext', 'products', ['name', 'description'], unique=False, mysql_prefix='FULLTEXT')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'mysql':
+        op.drop_index('ix_products_fulltext', table_name='products')
@@ -0,0 +1,37 @@
+"""order items checkout snapshot
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 07:53:57.791925
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('unit_price', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('store_id', sa.Integer(), nullable=True))
+
+    # Existing items only have the product's current price and store to go by
+    op.execute('UPDATE order_items SET '
+               'unit_price = (SELECT products.price FROM products WHERE products.id = order_items.product_id), '
+               'store_id = (SELECT products.store_id FROM products WHERE products.id = order_items.product_id)')
+
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.alter_column('unit_price', existing_type=sa.Float(), nullable=False)
+        batch_op.alter_column('store_id', existing_type=sa.Integer(), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.drop_column('store_id')
+        batch_op.drop_column('unit_price')
@@ -0,0 +1,46 @@
+"""event log own ids
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18 07:56:17.073962
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('event_log', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('outbox_id', sa.Integer(), nullable=True))
+
+    # Events logged so far kept their outbox id as id
+    op.execute('UPDATE event_log SET outbox_id = id')
+
+    with op.batch_alter_table('event_log', schema=None) as batch_op:
+        batch_op.alter_column('outbox_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.alter_column('id', existing_type=sa.Integer(), existing_nullable=False, autoincrement=True)
+        batch_op.create_unique_constraint('uq_event_log_outbox_id', ['outbox_id'])
+
+    if op.get_bind().dialect.name == 'sqlite':
+        # Only a rebuilt table gets AUTOINCREMENT (MySQL's AUTO_INCREMENT never reuses ids already)
+        with op.batch_alter_table('outbox_events', schema=None, recreate='always',
+                                  table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+            pass
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        with op.batch_alter_table('outbox_events', schema=None, recreate='always') as batch_op:
+            pass
+
+    with op.batch_alter_table('event_log', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_event_log_outbox_id', type_='unique')
+        batch_op.alter_column('id', existing_type=sa.Integer(), existing_nullable=False, autoincrement=False)
+        batch_op.drop_column('outbox_id')
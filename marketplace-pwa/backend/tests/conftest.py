@@ -0,0 +1,80 @@
+"""
+Tests run both backends in one app (create_app('all')) on a SQLite file per test. From the backend folder:
+    pip install -r requirements-dev.txt && python -m pytest
+TEST_DATABASE_URL=mysql+mysqlconnector://... runs them on an empty MySQL database instead (tables are created and
+dropped by every test)
+"""
+import os
+import sys
+
+# Config reads the environment when it's imported
+os.environ.setdefault('SECRET_KEY', 'test-secret-key-with-at-least-32-bytes')
+os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+os.environ.setdefault('RESPONSE_CACHE_TTL', '0')
+# Cheap hashes, logins aren't what the tests measure
+os.environ.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from app.factory import create_app
+from app.shared.auth import token_cache, user_cache
+from app.shared.config import Config
+from app.shared.database import sticky_users
+from app.shared.models import User, db
+
+PASSWORD = 'Passw0rd!long'
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+@pytest.fixture(autouse=True)
+def clear_process_caches():
+    # Module level caches outlive the apps, ids are reused by every test database
+    for cache in (user_cache, token_cache, sticky_users):
+        cache.clear()
+    yield
+
+@pytest.fixture
+def make_app(tmp_path):
+    """
+    Returns a function creating an app on a fresh SQLite file, config overrides as keyword arguments
+    """
+    apps = []
+
+    def factory(kind='all', **overrides):
+        settings = {'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URL or f"sqlite:///{tmp_path / 'primary.db'}",
+                    'ORDER_QUEUE_ENABLED': False,
+                    'TESTING': True, **overrides}
+        app = create_app(kind, type('TestConfig', (Config,), settings))
+        with app.app_context():
+            # Only the primary: replica binds registered by an earlier app stay in db.metadatas
+            db.create_all(bind_key=None)
+        apps.append(app)
+        return app
+
+    yield factory
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            if TEST_DATABASE_URL:
+                db.drop_all(bind_key=None)
+            for engine in db.engines.values():
+                engine.dispose()
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def auth_headers(client, username, is_admin=False):
+    """
+    Register and log in a user, returns the Authorization header of its token
+    """
+    client.post('/api/register', json={'username': username, 'email': f'{username}@example.com', 'password': PASSWORD})
+    if is_admin:
+        with client.application.app_context():
+            User.query.filter_by(username=username).update({'is_admin': True})
+            db.session.commit()
+    token = client.post('/api/login', json={'username': username, 'password': PASSWORD}).get_json()['token']
+    return {'Authorization': f'Bearer {token}'}
@@ -0,0 +1,26 @@
+from prometheus_client import REGISTRY
+from app.shared.models import User
+from conftest import auth_headers
+
+def test_demoted_admin_loses_access_right_away_in_the_same_process(app, client):
+    admin = auth_headers(client, 'admin', is_admin=True)
+    other = auth_headers(client, 'other', is_admin=True)
+    with app.app_context():
+        other_id = User.query.filter_by(username='other').one().id
+    # Cached by the first request
+    assert client.get('/admin/api/users', headers=other).status_code == 200
+    assert client.put(f'/admin/api/users/{other_id}', json={'is_admin': False}, headers=admin).status_code == 200
+    assert client.get('/admin/api/users', headers=other).status_code == 403
+    assert client.delete(f'/admin/api/users/{other_id}', headers=admin).status_code == 200
+    assert client.get('/api/orders', headers=other).status_code == 401
+
+def test_cache_counters_are_exported(client):
+    headers = auth_headers(client, 'buyer')
+    labels = {'cache': 'auth_user'}
+    hits, misses = (REGISTRY.get_sample_value(name, labels) or 0 for name in ('cache_hits_total', 'cache_misses_total'))
+    client.get('/api/orders', headers=headers)
+    client.get('/api/orders', headers=headers)
+    assert REGISTRY.get_sample_value('cache_misses_total', labels) == misses + 1
+    assert REGISTRY.get_sample_value('cache_hits_total', labels) == hits + 1
+    assert REGISTRY.get_sample_value('cache_size', labels) == 1
+    assert 'cache_hits_total{cache="auth_token"}' in client.get('/metrics').get_data(as_text=True)
@@ -0,0 +1,16 @@
+import pytest
+from benchmarks.report import percentile
+
+@pytest.mark.parametrize('values, fraction, expected', [
+    ([], 0.99, 0.0),
+    ([1, 2, 3, 4], 0.5, 2),
+    ([1, 2, 3, 4, 5], 0.5, 3),
+    ([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 0.95, 10),
+    (list(range(1, 101)), 0.99, 99),
+    (list(range(1, 101)), 0.95, 95),
+    (list(range(1, 201)), 0.99, 198),
+    ([7], 0.0, 7),
+    ([1, 2, 3], 1.0, 3),
+])
+def test_percentile_is_nearest_rank(values, fraction, expected):
+    assert percentile(values, fraction) == expected
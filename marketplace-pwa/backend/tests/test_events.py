@@ -0,0 +1,32 @@
+from app.shared import events
+from app.shared.models import EventLog, OutboxEvent, db
+
+def emit(count):
+    for index in range(count):
+        events.emit_event('product.updated', 'product', index)
+    db.session.commit()
+
+def test_drains_after_the_outbox_was_emptied(app):
+    with app.app_context():
+        emit(3)
+        assert events.drain_outbox(10) == 3
+        # The outbox is empty: new events must not get the ids of the drained ones back
+        emit(2)
+        assert events.drain_outbox(10) == 2
+        logged = db.session.query(EventLog.id, EventLog.outbox_id).order_by(EventLog.id).all()
+        assert [outbox_id for _, outbox_id in logged] == [1, 2, 3, 4, 5]
+        assert OutboxEvent.query.count() == 0
+
+def test_events_already_logged_are_not_logged_twice(app, monkeypatch):
+    dispatched = []
+    monkeypatch.setattr(events, 'dispatch', dispatched.extend)
+    with app.app_context():
+        emit(2)
+        first = OutboxEvent.query.order_by(OutboxEvent.id).first()
+        db.session.add(EventLog(outbox_id=first.id, event_type=first.event_type, aggregate_type=first.aggregate_type,
+                                aggregate_id=first.aggregate_id, payload=first.payload))
+        db.session.commit()
+        assert events.drain_outbox(10) == 2
+        assert EventLog.query.count() == 2
+        assert OutboxEvent.query.count() == 0
+        assert [event['id'] for event in dispatched] == [first.id + 1]
@@ -0,0 +1,26 @@
+import json
+import pytest
+from app.shared.models import Product, db
+from app.shared.utils import NDJSON_MIMETYPE
+from conftest import auth_headers
+
+@pytest.mark.parametrize('bad_row', [
+    {'name': 'big stock', 'price': 1, 'stock': 10 ** 20},
+    {'name': 'big price', 'price': 1e30},
+    {'name': 'n' * 256, 'price': 1},
+    {'name': 'long sku', 'price': 1, 'sku': 's' * 65},
+])
+def test_a_row_outside_the_column_limits_only_fails_itself(app, client, bad_row):
+    headers = auth_headers(client, 'seller')
+    store_id = client.post('/api/stores', json={'name': 'store', 'description': 'd'}, headers=headers).get_json()['store_id']
+    rows = [{'name': f'product {i}', 'price': 2, 'sku': f'sku-{i}', 'stock': 3} for i in range(5)]
+    rows.insert(2, bad_row)
+    body = ''.join(json.dumps(row) + '\n' for row in rows)
+    response = client.post(f'/api/stores/{store_id}/products/import', data=body,
+                           headers={**headers, 'Content-Type': NDJSON_MIMETYPE})
+    report = response.get_json()
+    assert response.status_code == 200
+    assert (report['imported'], report['failed']) == (5, 1)
+    assert [error['row'] for error in report['errors']] == [3]
+    with app.app_context():
+        assert db.session.query(Product).count() == 5
@@ -0,0 +1,31 @@
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine
+from app.shared.database import TimedQueuePool
+
+def test_metrics_are_only_served_to_allowed_networks(client):
+    client.get('/api/stores')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/stores",status="200"}' in response.get_data(as_text=True)
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '203.0.113.7'}).status_code == 403
+
+def test_allowed_networks_are_configurable(make_app):
+    client = make_app(METRICS_ALLOWED_NETWORKS='10.0.0.0/8').test_client()
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '10.1.2.3'}).status_code == 200
+    assert client.get('/metrics').status_code == 403
+
+def test_pool_usage_is_exported(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "pool.db"}', poolclass=TimedQueuePool, pool_size=2, max_overflow=1)
+    engine.pool.bind = 'test_pool'
+    labels = {'bind': 'test_pool'}
+    checkouts = REGISTRY.get_sample_value('db_pool_wait_seconds_count') or 0
+    connections = [engine.connect() for _ in range(3)]
+    assert REGISTRY.get_sample_value('db_pool_size', labels) == 2
+    assert REGISTRY.get_sample_value('db_pool_checked_out', labels) == 3
+    assert REGISTRY.get_sample_value('db_pool_overflow', labels) == 1
+    assert REGISTRY.get_sample_value('db_pool_wait_seconds_count') == checkouts + 3
+    for connection in connections:
+        connection.close()
+    assert REGISTRY.get_sample_value('db_pool_checked_out', labels) == 0
+    engine.dispose()
+    assert engine.pool.bind == 'test_pool'
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError, OperationalError
+from app.customer import customer_management, order_queue
+from app.customer.order_queue import process_order_requests
+from app.shared.models import Order, OrderRequest, User, db
+from conftest import auth_headers
+
+def create_product(client):
+    """
+    Logs in 'buyer' and creates a product in stock. Returns (auth headers, product id)
+    """
+    headers = auth_headers(client, 'buyer')
+    store_id = client.post('/api/stores', json={'name': 'store', 'description': 'd'}, headers=headers).get_json()['store_id']
+    product_id = client.post('/api/products', json={'name': 'product', 'description': 'd', 'price': 4, 'store_id': store_id,
+                                                    'stock': 10}, headers=headers).get_json()['product_id']
+    return headers, product_id
+
+@pytest.fixture
+def product(client):
+    return create_product(client)
+
+def test_queued_checkout_is_polled_until_completed(make_app):
+    app = make_app(ORDER_QUEUE_ENABLED=True)
+    client = app.test_client()
+    headers, product_id = create_product(client)
+    response = client.post('/api/orders', json={'items': [{'product_id': product_id, 'quantity': 2}]}, headers=headers)
+    assert response.status_code == 202
+    status_url = response.get_json()['status_url']
+    assert client.get(status_url, headers=headers).get_json()['status'] == 'pending'
+    with app.app_context():
+        assert process_order_requests(10) == 1
+    body = client.get(status_url, headers=headers).get_json()
+    assert body['status'] == 'completed' and body['order_id']
+
+def test_retry_with_the_same_key_replays_the_first_response(client, product):
+    headers, product_id = product
+    headers = {**headers, 'Idempotency-Key': 'checkout-1'}
+    items = {'items': [{'product_id': product_id, 'quantity': 1}]}
+    first = client.post('/api/orders', json=items, headers=headers)
+    retry = client.post('/api/orders', json=items, headers=headers)
+    assert first.status_code == retry.status_code == 201
+    assert first.get_json()['order_id'] == retry.get_json()['order_id']
+    assert client.post('/api/orders', json={'items': [{'product_id': product_id, 'quantity': 2}]},
+                       headers=headers).status_code == 422
+
+def test_concurrent_duplicate_key_is_replayed(app, client, product):
+    headers, product_id = product
+    items = [{'product_id': product_id, 'quantity': 1}]
+    with app.app_context():
+        buyer = User.query.filter_by(username='buyer').one()
+        competitor = {}
+
+        # Another request with the same key is stored between the lookup and the INSERT of this one
+        @event.listens_for(db.session, 'before_flush', once=True)
+        def store_competitor(session, flush_context, instances):
+            with db.engine.begin() as connection:
+                competitor['id'] = connection.execute(OrderRequest.__table__.insert().values(
+                    user_id=buyer.id, idempotency_key='checkout-1', request_hash=hashlib.sha256(
+                        json.dumps(items, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest(),
+                    items=json.dumps(items), status='pending')).inserted_primary_key[0]
+
+        result, status = customer_management.create_order_logic(buyer, {'items': items}, 'checkout-1')
+        assert status == 202
+        assert result['order_request_id'] == competitor['id']
+        assert Order.query.count() == 0
+
+def test_integrity_errors_without_a_key_are_not_replayed(client, product, monkeypatch):
+    headers, product_id = product
+    def fail(order_request):
+        raise IntegrityError('INSERT', {}, Exception('constraint failed'))
+    monkeypatch.setattr(customer_management, 'process_order_request', fail)
+    response = client.post('/api/orders', json={'items': [{'product_id': product_id, 'quantity': 1}]}, headers=headers)
+    assert response.status_code == 500
+    assert response.get_json() == {'message': 'Failed to create order'}
+
+def transient_failure(monkeypatch, failures=1):
+    """
+    place_order raises an OperationalError (eg: a lock wait timeout) the first 'failures' times. Returns the calls
+    """
+    calls = []
+    place_order = customer_management.place_order
+    def flaky_place_order(user_id, items):
+        calls.append(user_id)
+        if len(calls) <= failures:
+            raise OperationalError('UPDATE products', {}, Exception('Lock wait timeout exceeded'))
+        return place_order(user_id, items)
+    monkeypatch.setattr(customer_management, 'place_order', flaky_place_order)
+    return calls
+
+def test_retry_after_a_transient_error_places_the_order(app, client, product, monkeypatch):
+    headers, product_id = product
+    headers = {**headers, 'Idempotency-Key': 'checkout-1'}
+    items = {'items': [{'product_id': product_id, 'quantity': 1}]}
+    calls = transient_failure(monkeypatch)
+    assert client.post('/api/orders', json=items, headers=headers).status_code == 500
+    retry = client.post('/api/orders', json=items, headers=headers)
+    assert retry.status_code == 201
+    assert len(calls) == 2
+    with app.app_context():
+        assert Order.query.count() == 1
+
+def test_worker_leaves_a_request_pending_after_a_transient_error(make_app, monkeypatch):
+    app = make_app(ORDER_QUEUE_ENABLED=True)
+    client = app.test_client()
+    headers, product_id = create_product(client)
+    status_url = client.post('/api/orders', json={'items': [{'product_id': product_id, 'quantity': 1}]},
+                             headers=headers).get_json()['status_url']
+    calls = transient_failure(monkeypatch)
+    with app.app_context():
+        process_order_requests(10)
+    assert client.get(status_url, headers=headers).get_json()['status'] == 'pending'
+    with app.app_context():
+        process_order_requests(10)
+    assert client.get(status_url, headers=headers).get_json()['status'] == 'completed'
+    assert len(calls) == 2
+
+def test_worker_locks_the_products_of_the_whole_batch_first(make_app, monkeypatch):
+    app = make_app(ORDER_QUEUE_ENABLED=True)
+    client = app.test_client()
+    headers, first = create_product(client)
+    _, second = create_product(client)
+    for product_ids in ([second, first], [first]):
+        client.post('/api/orders', json={'items': [{'product_id': product_id, 'quantity': 1} for product_id in product_ids]},
+                    headers=headers)
+    calls = []
+    lock_products, place_order = order_queue.lock_products, customer_management.place_order
+    monkeypatch.setattr(order_queue, 'lock_products',
+                        lambda product_ids: calls.append(set(product_ids)) or lock_products(product_ids))
+    monkeypatch.setattr(customer_management, 'place_order', lambda *args: calls.append('order') or place_order(*args))
+    with app.app_context():
+        assert process_order_requests(10) == 2
+    assert calls == [{first, second}, 'order', 'order']
@@ -0,0 +1,50 @@
+"""
+Concurrent checkouts of the last units of a product: stock never goes below zero and exactly as many orders as
+units in stock succeed. SQLite has a single writer, so the race between checkouts only really happens on MySQL
+(TEST_DATABASE_URL, see conftest.py). There, and on SQLite when a writer finds the database locked, a checkout can
+fail with a 500: buyers retry with the same Idempotency-Key like a real client would, which must never place a
+second order. The test prints the checkouts/sec it measured (pytest -s to see it)
+"""
+import threading
+import time
+import uuid
+from app.shared.models import Order, Product, db
+from conftest import auth_headers
+
+STOCK = 25
+BUYERS = 50
+
+def buy(client, headers, product_id, results, barrier):
+    key = str(uuid.uuid4())
+    barrier.wait()
+    for _ in range(50):
+        response = client.post('/api/orders', json={'items': [{'product_id': product_id, 'quantity': 1}]},
+                               headers={**headers, 'Idempotency-Key': key})
+        if response.status_code not in (500, 503):
+            break
+    results.append(response.status_code)
+
+def test_concurrent_checkouts_never_oversell(make_app):
+    app = make_app()
+    client = app.test_client()
+    headers = auth_headers(client, 'seller')
+    store_id = client.post('/api/stores', json={'name': 'store', 'description': 'd'}, headers=headers).get_json()['store_id']
+    product_id = client.post('/api/products', json={'name': 'last units', 'description': 'd', 'price': 10,
+                                                    'store_id': store_id, 'stock': STOCK}, headers=headers).get_json()['product_id']
+    buyers = [auth_headers(client, f'buyer{index}') for index in range(BUYERS)]
+    results = []
+    barrier = threading.Barrier(BUYERS)
+    threads = [threading.Thread(target=buy, args=(app.test_client(), buyer, product_id, results, barrier))
+               for buyer in buyers]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    print(f'\n{BUYERS} concurrent checkouts in {elapsed:.2f}s: {BUYERS / elapsed:.1f} checkouts/sec '
+          f'({STOCK / elapsed:.1f} orders/sec) on {app.config["SQLALCHEMY_DATABASE_URI"].split(":")[0]}')
+    assert sorted(results) == [201] * STOCK + [409] * (BUYERS - STOCK)
+    with app.app_context():
+        assert db.session.get(Product, product_id).stock == 0
+        assert Order.query.count() == STOCK
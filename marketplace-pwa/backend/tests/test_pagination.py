@@ -0,0 +1,50 @@
+import pytest
+from app.shared.utils import encode_cursor
+from conftest import auth_headers
+
+@pytest.fixture
+def catalog(client):
+    headers = auth_headers(client, 'seller')
+    store_id = client.post('/api/stores', json={'name': 'store', 'description': 'd'}, headers=headers).get_json()['store_id']
+    for index in range(5):
+        client.post('/api/products', json={'name': f'product {index}', 'description': 'd', 'price': index + 0.5,
+                                           'store_id': store_id}, headers=headers)
+    return headers
+
+def test_cursor_walks_every_page(client, catalog):
+    names, cursor = [], None
+    while True:
+        response = client.get('/api/products', query_string={'sort': 'price', 'limit': 2, 'cursor': cursor or ''})
+        assert response.status_code == 200
+        page = response.get_json()
+        names += [product['name'] for product in page['items']]
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    assert names == [f'product {index}' for index in range(5)]
+
+@pytest.mark.parametrize('path, values', [
+    ('/api/products?sort=price', [None, 1]),
+    ('/api/products?sort=price', [{'a': 1}, 1]),
+    ('/api/products?sort=price', [[1], 1]),
+    ('/api/products?sort=price', ['1.5', 1]),
+    ('/api/products?sort=name', [1, 1]),
+    ('/api/products?sort=name', ['name', '1']),
+    ('/api/products', [True]),
+    ('/api/products', [1.5]),
+    ('/api/stores', [[1]]),
+    ('/api/stores?sort=name', ['name']),
+    ('/api/products/search?q=product', [None, 1]),
+    ('/api/products/search?q=product', ['relevance', 1]),
+])
+def test_cursor_values_of_the_wrong_type_are_rejected(client, catalog, path, values):
+    separator = '&' if '?' in path else '?'
+    response = client.get(f'{path}{separator}cursor={encode_cursor(values)}')
+    assert response.status_code == 400
+
+def test_admin_user_cursor_is_validated(client):
+    headers = auth_headers(client, 'admin', is_admin=True)
+    response = client.get(f"/admin/api/users?sort=username&cursor={encode_cursor([None, 1])}", headers=headers)
+    assert response.status_code == 400
+    response = client.get(f"/admin/api/users?sort=username&cursor={encode_cursor(['admin', 0])}", headers=headers)
+    assert response.status_code == 200
@@ -0,0 +1,25 @@
+import pytest
+from werkzeug.security import generate_password_hash
+from app.shared import passwords
+from app.shared.config import Config
+
+@pytest.mark.parametrize('method, hash_method', [
+    ('', 'scrypt'),
+    ('scrypt', 'scrypt'),
+    ('pbkdf2', 'pbkdf2'),
+    ('pbkdf2:sha256:1000', 'pbkdf2:sha256:1000'),
+])
+def test_hashes_of_the_configured_method_are_kept(monkeypatch, method, hash_method):
+    monkeypatch.setattr(Config, 'PASSWORD_HASH_METHOD', method)
+    assert not passwords.needs_rehash(generate_password_hash('secret', hash_method))
+    assert not passwords.needs_rehash(passwords.hash_password('secret'))
+
+@pytest.mark.parametrize('method, hash_method', [
+    ('', 'pbkdf2:sha256:600000'),
+    ('scrypt', 'pbkdf2'),
+    ('pbkdf2', 'pbkdf2:sha256:1000'),
+    ('pbkdf2:sha256:1000', 'scrypt'),
+])
+def test_hashes_of_another_method_or_cost_are_rehashed(monkeypatch, method, hash_method):
+    monkeypatch.setattr(Config, 'PASSWORD_HASH_METHOD', method)
+    assert passwords.needs_rehash(generate_password_hash('secret', hash_method))
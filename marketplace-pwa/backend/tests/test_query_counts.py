@@ -0,0 +1,53 @@
+"""
+N+1 guard: the list endpoints must run the same number of statements whatever the number of rows they return
+"""
+import contextlib
+import pytest
+from sqlalchemy import event
+from app.shared.models import db
+from conftest import auth_headers
+
+@contextlib.contextmanager
+def count_statements(app):
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+def add_rows(client, headers, count):
+    """
+    count stores, each with one product, and one order of that product
+    """
+    for _ in range(count):
+        store_id = client.post('/api/stores', json={'name': 'store', 'description': 'd'}, headers=headers).get_json()['store_id']
+        product_id = client.post('/api/products', json={'name': 'product', 'description': 'd', 'price': 3,
+                                                        'store_id': store_id, 'stock': 5}, headers=headers).get_json()['product_id']
+        response = client.post('/api/orders', json={'items': [{'product_id': product_id, 'quantity': 1}]}, headers=headers)
+        assert response.status_code == 201
+    client.post('/api/register', json={'username': f'user{count}', 'email': f'user{count}@example.com', 'password': 'x' * 12})
+
+@pytest.mark.parametrize('path', [
+    '/api/stores?limit=100',
+    '/api/products?limit=100',
+    '/api/products/search?q=product&limit=100',
+    '/api/orders',
+    '/api/orders?include=products',
+    '/admin/api/users?limit=100',
+])
+def test_list_endpoints_run_a_constant_number_of_statements(app, client, path):
+    headers = auth_headers(client, 'admin', is_admin=True)
+    counts = []
+    for count in (2, 10):
+        add_rows(client, headers, count)
+        client.get(path, headers=headers)  # warm-up: auth caches
+        with count_statements(app) as statements:
+            response = client.get(path, headers=headers)
+        assert response.status_code == 200
+        counts.append(len(statements))
+    assert counts[0] == counts[1], f'{path}: {counts[0]} statements for 2 rows, {counts[1]} for 12'
@@ -0,0 +1,10 @@
+from app.shared.query_plan import EXPECTED_FULL_SCANS, HOT_QUERIES
+
+def test_check_query_plans_passes_on_sqlite(app):
+    result = app.test_cli_runner().invoke(args=['check-query-plans'])
+    assert result.exit_code == 0, result.output
+    assert 'FULL SCAN' not in result.output
+
+def test_expected_full_scans_name_hot_queries():
+    names = {name for name, _ in HOT_QUERIES}
+    assert {name for _, name in EXPECTED_FULL_SCANS} <= names
@@ -0,0 +1,107 @@
+"""
+Read replica routing, with a copy of the primary's SQLite file as the replica
+"""
+import contextlib
+import shutil
+import pytest
+from sqlalchemy import event
+from app.shared.database import STICKY_COOKIE, replica_engines, replica_reads, sticky_users
+from app.shared.models import Store, db
+from conftest import auth_headers
+
+@pytest.fixture
+def replicated(make_app, tmp_path):
+    primary_path, replica_path = tmp_path / 'primary.db', tmp_path / 'replica.db'
+    app = make_app(SQLALCHEMY_DATABASE_URI=f'sqlite:///{primary_path}', DATABASE_REPLICA_URLS=[f'sqlite:///{replica_path}'])
+    with app.app_context():
+        primary, replica = db.engines[None], replica_engines(db.engines)[0]
+
+    def sync_replica():
+        """
+        The replica catches up with everything committed on the primary so far
+        """
+        primary.dispose()
+        replica.dispose()
+        shutil.copyfile(primary_path, replica_path)
+
+    return app, primary, replica, sync_replica
+
+@contextlib.contextmanager
+def count_statements(engine):
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+def create_store(client, headers, name):
+    response = client.post('/api/stores', json={'name': name, 'description': 'd'}, headers=headers)
+    assert response.status_code == 201
+    return response
+
+def store_names(client, headers=None):
+    return [store['name'] for store in client.get('/api/stores', headers=headers).get_json()['items']]
+
+def test_reads_go_to_the_replica(replicated):
+    app, primary, replica, sync_replica = replicated
+    client = app.test_client()
+    headers = auth_headers(client, 'seller')
+    create_store(client, headers, 'replicated')
+    sync_replica()
+    create_store(client, headers, 'not replicated yet')
+    with count_statements(primary) as primary_statements, count_statements(replica) as replica_statements:
+        assert store_names(app.test_client()) == ['replicated']
+    assert replica_statements and not primary_statements
+
+def test_writes_and_locking_reads_stay_on_the_primary(replicated):
+    app, primary, replica, sync_replica = replicated
+    client = app.test_client()
+    headers = auth_headers(client, 'seller')
+    sync_replica()
+    with count_statements(replica) as replica_statements:
+        create_store(client, headers, 'new')
+    assert not replica_statements
+
+    @replica_reads
+    def read_stores():
+        locked = [store.name for store in Store.query.with_for_update().all()]
+        db.session.rollback()
+        return locked, [store.name for store in Store.query.all()]
+
+    with app.app_context():
+        locked, plain = read_stores()
+    assert locked == ['new']
+    assert plain == []
+
+def test_the_writer_reads_from_the_primary_after_a_write(replicated):
+    app, primary, replica, sync_replica = replicated
+    client = app.test_client()
+    headers = auth_headers(client, 'seller')
+    sync_replica()
+    response = create_store(client, headers, 'new')
+    assert STICKY_COOKIE in response.headers.get('Set-Cookie', '')
+    # The cookie keeps the browser on the primary whichever worker serves it, even without a token
+    assert store_names(client) == ['new']
+    # In the worker that served the write, the user is sticky even without the cookie
+    assert store_names(app.test_client(), headers) == ['new']
+    # Everybody else reads the (stale) replica
+    assert store_names(app.test_client()) == []
+    assert store_names(app.test_client(), auth_headers(app.test_client(), 'other')) == []
+    # Once the sticky window is over, the writer is back on the replica
+    sticky_users.clear()
+    assert store_names(app.test_client(), headers) == []
+
+def test_batched_reads_follow_the_sticky_cookie(replicated):
+    app, primary, replica, sync_replica = replicated
+    client = app.test_client()
+    headers = auth_headers(client, 'seller')
+    sync_replica()
+    create_store(client, headers, 'new')
+    # Only the cookie keeps the sub-requests on the primary (eg: the batch is served by another worker)
+    sticky_users.clear()
+    response = client.post('/api/batch', json={'requests': [{'path': '/api/stores'}]}, headers=headers)
+    body = response.get_json()['responses'][0]['body']
+    assert [store['name'] for store in body['items']] == ['new']
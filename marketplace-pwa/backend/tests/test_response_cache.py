@@ -0,0 +1,20 @@
+from conftest import auth_headers
+
+def test_ttl_comes_from_the_app_config(make_app):
+    client = make_app(RESPONSE_CACHE_TTL=30).test_client()
+    first = client.get('/api/stores')
+    assert first.headers.get('ETag')
+    assert client.get('/api/stores', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+def test_cache_is_off_with_a_zero_ttl(make_app):
+    client = make_app(RESPONSE_CACHE_TTL=0).test_client()
+    assert 'ETag' not in client.get('/api/stores').headers
+
+def test_a_change_invalidates_the_cached_listing(make_app):
+    client = make_app(RESPONSE_CACHE_TTL=30).test_client()
+    headers = auth_headers(client, 'seller')
+    etag = client.get('/api/stores').headers['ETag']
+    client.post('/api/stores', json={'name': 'store', 'description': 'd'}, headers=headers)
+    response = client.get('/api/stores', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert [store['name'] for store in response.get_json()['items']] == ['store']
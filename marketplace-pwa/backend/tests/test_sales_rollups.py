@@ -0,0 +1,44 @@
+from app.shared.analytics import backfill_sales_rollups
+from app.shared.models import Order, ProductSalesRollup, StoreSalesRollup, db
+from conftest import auth_headers
+
+def rollup_totals(app):
+    with app.app_context():
+        stores = {(row.period, row.store_id): (row.orders, row.units, row.revenue) for row in StoreSalesRollup.query}
+        products = {(row.period, row.product_id): (row.store_id, row.units, row.revenue) for row in ProductSalesRollup.query}
+    return stores, products
+
+def test_deleting_an_order_reverses_the_checkout_price_and_store(app, client):
+    headers = auth_headers(client, 'seller')
+    first_store, second_store = [client.post('/api/stores', json={'name': name, 'description': 'd'}, headers=headers)
+                                 .get_json()['store_id'] for name in ('first', 'second')]
+    product_id = client.post('/api/products', json={'name': 'product', 'description': 'd', 'price': 10,
+                                                    'store_id': first_store}, headers=headers).get_json()['product_id']
+    order_id = client.post('/api/orders', json={'items': [{'product_id': product_id, 'quantity': 3}]},
+                           headers=headers).get_json()['order_id']
+    stores, products = rollup_totals(app)
+    assert stores[('day', first_store)] == (1, 3, 30.0)
+    assert products[('week', product_id)] == (first_store, 3, 30.0)
+    # The product moves to another store at another price after the checkout
+    client.put(f'/api/products/{product_id}', json={'price': 25, 'store_id': second_store}, headers=headers)
+    orders = client.get('/api/orders?include=products', headers=headers).get_json()
+    assert orders[0]['items'][0]['price'] == 10
+    # Rebuilding the rollups gives the same numbers as the incremental updates
+    with app.app_context():
+        backfill_sales_rollups()
+    assert rollup_totals(app) == (stores, products)
+    assert client.delete(f'/api/orders/{order_id}', headers=headers).status_code == 200
+    stores, products = rollup_totals(app)
+    assert stores[('day', first_store)] == (0, 0, 0.0)
+    assert ('day', second_store) not in stores
+    assert products[('day', product_id)] == (first_store, 0, 0.0)
+
+def test_order_date_is_the_rollup_timestamp(app, client):
+    headers = auth_headers(client, 'seller')
+    store_id = client.post('/api/stores', json={'name': 'store', 'description': 'd'}, headers=headers).get_json()['store_id']
+    product_id = client.post('/api/products', json={'name': 'product', 'description': 'd', 'price': 2,
+                                                    'store_id': store_id}, headers=headers).get_json()['product_id']
+    client.post('/api/orders', json={'items': [{'product_id': product_id, 'quantity': 1}]}, headers=headers)
+    with app.app_context():
+        order_date = db.session.query(Order.order_date).scalar()
+        assert StoreSalesRollup.query.filter_by(period='day').one().period_start == order_date.date()
@@ -0,0 +1,43 @@
+import json
+from sqlalchemy import event
+from app.shared.models import Store, db
+from app.shared.utils import NDJSON_MIMETYPE, iter_keyset
+from conftest import auth_headers
+
+def create_stores(client, count):
+    headers = auth_headers(client, 'seller')
+    for index in range(count):
+        client.post('/api/stores', json={'name': f'store {index}', 'description': 'd'}, headers=headers)
+    return headers
+
+def test_iter_keyset_reads_every_row_in_chunks(app, client):
+    create_stores(client, 7)
+    with app.app_context():
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+        ids = [store.id for store in iter_keyset(Store.query.filter(Store.name.like('store %')), Store.id, batch_size=3)]
+        # 3 + 3 + 1 rows, each chunk is its own LIMIT query
+        assert ids == sorted(ids) and len(ids) == 7
+        assert len(statements) == 3
+        assert all('LIMIT' in statement for statement in statements)
+
+def test_ndjson_export_streams_every_row(client):
+    headers = create_stores(client, 5)
+    response = client.get('/api/stores', headers={**headers, 'Accept': NDJSON_MIMETYPE})
+    assert response.status_code == 200
+    assert response.mimetype == NDJSON_MIMETYPE
+    names = [json.loads(line)['name'] for line in response.get_data(as_text=True).splitlines()]
+    assert names == [f'store {index}' for index in range(5)]
+
+def test_ndjson_exports_of_orders_and_users(client):
+    headers = auth_headers(client, 'admin', is_admin=True)
+    store_id = client.post('/api/stores', json={'name': 'store', 'description': 'd'}, headers=headers).get_json()['store_id']
+    product_id = client.post('/api/products', json={'name': 'product', 'description': 'd', 'price': 2, 'store_id': store_id,
+                                                    'stock': 10}, headers=headers).get_json()['product_id']
+    for _ in range(3):
+        assert client.post('/api/orders', json={'items': [{'product_id': product_id, 'quantity': 1}]}, headers=headers).status_code == 201
+    ndjson = {**headers, 'Accept': NDJSON_MIMETYPE}
+    orders = client.get('/api/orders?include=products', headers=ndjson).get_data(as_text=True).splitlines()
+    assert [len(json.loads(line)['items']) for line in orders] == [1, 1, 1]
+    users = client.get('/admin/api/users', headers=ndjson).get_data(as_text=True).splitlines()
+    assert [json.loads(line)['username'] for line in users] == ['admin']
@@ -14,14 +14,13 @@ const StorePage = ({ addToCart }) => {
     const fetchStoreData = async () => {
       try {
         setLoading(true); // Set loading to true before fetching data
-        const storeData = await api.get(`/stores/${storeId}`);
+        // Store and its products in one round trip. Products are filtered on the server
+        const [storeData, productsData] = await api.batch([
+          `stores/${storeId}`,
+          `products?store_id=${storeId}`,
+        ]);
         setStore(storeData);
-        const productsData = await api.get("/products");
-        setProducts(
-          productsData.filter(
-            (product) => product.store_id === parseInt(storeId)
-          )
-        );
+        setProducts(productsData.items);
         setLoading(false);
       } catch (err) {
         setError(err.message || "Failed to load store data");
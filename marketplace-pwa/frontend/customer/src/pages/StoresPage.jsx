@@ -11,8 +11,9 @@ const StoresPage = () => {
     const fetchStores = async () => {
       try {
         setLoading(true);
+        // Listing is paginated; first page only until lazy loading is added
         const data = await api.get("/stores");
-        setStores(data);
+        setStores(data.items);
       } catch (err) {
         setError(err.message || "Failed to load stores");
       } finally {
@@ -75,6 +75,28 @@ const api = {
     }
     return response.json();
   },
+
+  // batch runs several GET requests in one round trip (POST /batch), eg: ["stores/1", "products?store_id=1"]
+  // Resolves to the body of each request in the same order, and rejects if any of them failed
+  batch: async (endpoints, token = null) => {
+    const basePath = new URL(API_BASE_URL, window.location.origin).pathname.replace(/\/$/, "");
+    const data = await api.post(
+      "batch",
+      {
+        requests: endpoints.map((endpoint) => ({
+          method: "GET",
+          path: `${basePath}/${endpoint.replace(/^\//, "")}`,
+        })),
+      },
+      token
+    );
+    return data.responses.map((response) => {
+      if (response.status >= 400) {
+        throw new Error(`API request failed: ${response.status}`);
+      }
+      return response.body;
+    });
+  },
 };
 
 export default api;